@@ -2,8 +2,27 @@ import os
 import json
 import logging
 from lambda_functions.utils.geolocation_utils import get_coordinates
-from lambda_functions.utils.wildfire_utils import process_fires
-from lambda_functions.utils.dynamodb_utils import get_subscriptions
+from lambda_functions.utils.wildfire_utils import (
+    process_fires,
+    fetch_fire_data,
+    get_snapshot_version,
+    subscription_thresholds
+)
+from lambda_functions.utils.dynamodb_utils import scan_subscriptions_page, validate_subscription
+from lambda_functions.utils.cluster_utils import cluster_fires
+from lambda_functions.utils.location_table_utils import (
+    load_location_table,
+    upsert_subscriber_locations,
+    compact_pending_locations,
+    match_topics
+)
+from lambda_functions.utils.checkpoint_utils import (
+    get_run_id,
+    new_checkpoint,
+    load_checkpoint,
+    save_checkpoint,
+    continue_run
+)
 
 # Set up logging
 logger = logging.getLogger()
@@ -12,6 +31,32 @@ logger.setLevel(logging.INFO)
 # Retrieve S3 bucket name from environment variables
 BUCKET_NAME = os.environ['BUCKET_NAME']
 
+CHECKPOINT_INTERVAL = 25  # Save a checkpoint after this many processed topics
+MIN_REMAINING_MS = 30000  # Stop and checkpoint when less than 30 seconds remain
+
+class RunIncompleteError(Exception):
+    """Raised out of the handler so Lambda retries the invocation and the run resumes from its checkpoint."""
+
+def _out_of_time(context):
+    get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    return get_remaining is not None and get_remaining() < MIN_REMAINING_MS
+
+def _save_geocoded_locations(locations):
+    """Add locations geocoded during this run to the subscriber location table for the next one."""
+    if not locations:
+        return
+    try:
+        upsert_subscriber_locations(BUCKET_NAME, locations)
+    except Exception as e:
+        logger.warning("Failed to update subscriber location table: %s", str(e))
+
+def _compact_pending_locations(context):
+    """Merge queued sign-ups into the subscriber location table. Failures leave them queued for the next run."""
+    try:
+        compact_pending_locations(BUCKET_NAME, should_stop=lambda: _out_of_time(context))
+    except Exception as e:
+        logger.warning("Failed to compact queued subscriber locations: %s", str(e))
+
 def lambda_handler(event, context):
     logger.info("DailyMonitoringFunction triggered")
 
@@ -21,52 +66,173 @@ def lambda_handler(event, context):
             logger.warning("Invalid event source: %s", event.get('source'))
             return {"statusCode": 400, "body": json.dumps({"error": "Invalid event source"})}
 
-        # Fetch all subscriptions from DynamoDB
-        subscriptions = get_subscriptions()
-        if not subscriptions:
+        # Resume from the checkpoint of this run if a previous invocation stopped midway
+        run_id = get_run_id(event)
+        checkpoint = load_checkpoint(BUCKET_NAME, run_id) or new_checkpoint(run_id)
+        if checkpoint["completed"]:
+            logger.info("Run %s already completed, nothing to resume", run_id)
+            return {"statusCode": 200, "body": json.dumps({"message": "Daily check already completed"})}
+
+        cursor = checkpoint["cursor"]
+        processed_topics = set(checkpoint["processed_topics"])
+        failed_topics = set(checkpoint["failed_topics"])
+        if processed_topics or failed_topics:
+            logger.info("Resuming run %s with %d topics already processed and %d failed",
+                        run_id, len(processed_topics), len(failed_topics))
+
+        # Fetch the first page of subscriptions from DynamoDB
+        subscriptions, next_cursor = scan_subscriptions_page(cursor)
+        if not subscriptions and not next_cursor and cursor is None:
             logger.info("No subscriptions found in DynamoDB.")
             return {"statusCode": 200, "body": json.dumps({"message": "No subscriptions to process"})}
 
-        logger.info("Found %d subscriptions", len(subscriptions))
+        # Fetch the FIRMS snapshot once and share it across all subscriptions
+        fire_data = fetch_fire_data()
+        if fire_data is None:
+            logger.error("Failed to fetch wildfire data from NASA")
+            return {"statusCode": 502, "body": json.dumps({"error": "Failed to fetch wildfire data"})}
+
+        # Cluster the whole snapshot once so every subscriber's alert references the same cluster IDs
+        fire_data = cluster_fires(fire_data)
+        snapshot_version = get_snapshot_version(fire_data)
+        logger.info("Fetched %d fire detections (snapshot %s)", len(fire_data), snapshot_version)
 
-        # Process each subscription
-        for sub in subscriptions:
-            zip_code = sub.get('zip_code')
-            email = sub.get('email')
-            topic_arn = sub.get('sns_topic_arn')
+        # Merge sign-ups queued since the last compaction, then match all known subscriber locations
+        # against the snapshot, one batched pass per threshold group
+        _compact_pending_locations(context)
+        location_table = load_location_table(BUCKET_NAME)
+        active_topics = match_topics(location_table, fire_data) if location_table is not None else set()
+        logger.info("%d topics have fires nearby", len(active_topics))
+        geocoded_locations = []
 
-            if not zip_code or not email:
-                logger.warning("Missing zip_code or email in subscription: %s", sub)
-                continue
+        processed_since_checkpoint = 0
+        while True:
+            logger.info("Processing page of %d subscriptions", len(subscriptions))
 
-            if not topic_arn:
-                logger.warning("No SNS topic for zip_code %s, skipping", zip_code)
-                continue
+            # Process each subscription
+            for sub in subscriptions:
+                zip_code = sub.get('zip_code')
+                email = sub.get('email')
+                topic_arn = sub.get('sns_topic_arn')
 
-            try:
-                coordinates = get_coordinates(zip_code)
-                if not coordinates:
-                    logger.warning("Could not get coordinates for zip_code: %s", zip_code)
+                if not zip_code or not email:
+                    logger.warning("Missing zip_code or email in subscription: %s", sub)
                     continue
 
-                logger.info("Processing fires for zip_code: %s, email: %s", zip_code, email)
-                process_fires(
-                    lat=coordinates[0],
-                    lon=coordinates[1],
-                    email=email,
-                    zip_code=zip_code,
-                    topic_arn=topic_arn,
-                    bucket_name=BUCKET_NAME
-                )
+                if not topic_arn:
+                    logger.warning("No SNS topic for zip_code %s, skipping", zip_code)
+                    continue
+
+                # Invalid records would fail on every retry, so they are skipped rather than counted as failures
+                try:
+                    validate_subscription(email, zip_code, topic_arn)
+                except ValueError as e:
+                    logger.warning("Skipping invalid subscription: %s", str(e))
+                    continue
 
-                logger.info("Finished processing for zip_code: %s", zip_code)
+                # An alert published to a topic reaches all of its subscribers, so it is sent once per run;
+                # later subscribers of an alerted topic only get their own fire data saved
+                already_alerted = topic_arn in processed_topics
+                alert_radius_miles, frp_threshold = subscription_thresholds(sub)
 
-            except Exception as e:
-                logger.error("Error processing subscription for zip_code %s: %s", zip_code, str(e), exc_info=True)
-                continue
+                try:
+                    coordinates = location_table.coordinates_for(topic_arn) if location_table is not None else None
+                    if coordinates is not None and topic_arn not in active_topics:
+                        # The table match already found no fires near this topic
+                        processed_topics.add(topic_arn)
+                        failed_topics.discard(topic_arn)
+                        continue
 
+                    if coordinates is None:
+                        coordinates = get_coordinates(zip_code)
+                        if not coordinates:
+                            logger.warning("Could not get coordinates for zip_code: %s", zip_code)
+                            continue
+                        geocoded_locations.append({
+                            "topic_arn": topic_arn,
+                            "zip_code": zip_code,
+                            "latitude": coordinates[0],
+                            "longitude": coordinates[1],
+                            "alert_radius_miles": alert_radius_miles,
+                            "frp_threshold": frp_threshold
+                        })
+
+                    logger.info("Processing fires for zip_code: %s, email: %s", zip_code, email)
+                    succeeded = process_fires(
+                        lat=coordinates[0],
+                        lon=coordinates[1],
+                        email=email,
+                        zip_code=zip_code,
+                        topic_arn=topic_arn,
+                        bucket_name=BUCKET_NAME,
+                        data=fire_data,
+                        snapshot_version=snapshot_version,
+                        alert_radius_miles=alert_radius_miles,
+                        frp_threshold=frp_threshold,
+                        publish=not already_alerted
+                    )
+
+                    if not succeeded:
+                        logger.warning("Processing failed for zip_code %s, email %s", zip_code, email)
+                        if not already_alerted:
+                            failed_topics.add(topic_arn)
+                        continue
+
+                    if not already_alerted:
+                        # Only topics whose alert was sent are checkpointed, so failed ones are retried
+                        processed_topics.add(topic_arn)
+                        failed_topics.discard(topic_arn)
+                        processed_since_checkpoint += 1
+                    logger.info("Finished processing for zip_code: %s", zip_code)
+
+                except Exception as e:
+                    logger.error("Error processing subscription for zip_code %s: %s", zip_code, str(e), exc_info=True)
+                    continue
+
+                if processed_since_checkpoint >= CHECKPOINT_INTERVAL:
+                    save_checkpoint(BUCKET_NAME, run_id, cursor, processed_topics, failed_topics)
+                    processed_since_checkpoint = 0
+
+                if _out_of_time(context):
+                    # The cursor still points at the start of this page; processed topics are skipped on resume
+                    # and failed ones from earlier pages are kept, so the run cannot complete without them
+                    save_checkpoint(BUCKET_NAME, run_id, cursor, processed_topics, failed_topics)
+                    _save_geocoded_locations(geocoded_locations)
+                    logger.warning("Running out of time, checkpointed run %s", run_id)
+
+                    # Nothing else would pick the run up before tomorrow's schedule, so continue it now
+                    try:
+                        continued = continue_run(context.function_name, event)
+                    except Exception as e:
+                        raise RunIncompleteError(f"Could not continue run {run_id}") from e
+                    return {"statusCode": 202, "body": json.dumps({
+                        "message": "Daily check checkpointed" if continued else "Daily check stopped at continuation limit",
+                        "processed_topics": len(processed_topics)
+                    })}
+
+            if not next_cursor:
+                break
+
+            cursor = next_cursor
+            save_checkpoint(BUCKET_NAME, run_id, cursor, processed_topics, failed_topics)
+            processed_since_checkpoint = 0
+            subscriptions, next_cursor = scan_subscriptions_page(cursor)
+
+        _save_geocoded_locations(geocoded_locations)
+
+        if failed_topics:
+            # Rescan from the start on retry; alerted topics are skipped, failed ones are sent again
+            save_checkpoint(BUCKET_NAME, run_id, None, processed_topics, failed_topics)
+            raise RunIncompleteError(f"Alerts failed for {len(failed_topics)} topics in run {run_id}")
+
+        save_checkpoint(BUCKET_NAME, run_id, None, processed_topics, completed=True)
         return {"statusCode": 200, "body": json.dumps({"message": "Daily check completed"})}
 
+    except RunIncompleteError:
+        # Lambda's async retry re-invokes with the same event, which resumes this run
+        logger.error("Daily check incomplete, raising for retry", exc_info=True)
+        raise
+
     except Exception as e:
         logger.error("Fatal error in lambda_handler: %s", str(e), exc_info=True)
         return {"statusCode": 500, "body": json.dumps({"error": "Internal server error"})}
@@ -0,0 +1,53 @@
+import os
+import json
+import logging
+from lambda_functions.utils.location_table_utils import load_location_table, compact_pending_locations
+from lambda_functions.utils.streaming_utils import load_snapshot, save_snapshot, poll_once
+
+# Set up logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Retrieve S3 bucket name from environment variables
+BUCKET_NAME = os.environ['BUCKET_NAME']
+
+MIN_REMAINING_MS = 10000  # Stop compacting queued sign-ups when less than 10 seconds remain
+
+def _out_of_time(context):
+    get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    return get_remaining is not None and get_remaining() < MIN_REMAINING_MS
+
+def lambda_handler(event, context):
+    logger.info("NearRealTimeFunction triggered")
+
+    try:
+        # Ensure the event is triggered by EventBridge
+        if event.get('source') != 'aws.events':
+            logger.warning("Invalid event source: %s", event.get('source'))
+            return {"statusCode": 400, "body": json.dumps({"error": "Invalid event source"})}
+
+        # Subscribers come from the precomputed location table, reloaded only when it changes in S3
+        table = load_location_table(BUCKET_NAME)
+        logger.info("Loaded %d subscriber topics", len(table) if table is not None else 0)
+
+        # Diff the current FIRMS detections against the previous poll and alert on new fires
+        previous = load_snapshot(BUCKET_NAME)
+        snapshot, alerted = poll_once(previous, table)
+
+        # Topics whose alert failed are kept in the snapshot and retried on the next poll
+        if snapshot is not None:
+            save_snapshot(BUCKET_NAME, snapshot)
+
+        # Merge sign-ups queued since the last poll with the time left after alerting; whatever is not
+        # merged stays queued, and new topics are matched from the next poll on
+        try:
+            compact_pending_locations(BUCKET_NAME, should_stop=lambda: _out_of_time(context))
+        except Exception as e:
+            logger.warning("Failed to compact queued subscriber locations: %s", str(e))
+
+        logger.info("Alerted %d topics", alerted)
+        return {"statusCode": 200, "body": json.dumps({"message": "Poll completed", "alerted_topics": alerted})}
+
+    except Exception as e:
+        logger.error("Fatal error in lambda_handler: %s", str(e), exc_info=True)
+        return {"statusCode": 500, "body": json.dumps({"error": "Internal server error"})}
@@ -0,0 +1,52 @@
+"""Run the near-real-time polling loop offline against local FIRMS CSV files.
+
+Each tick reads the next CSV in place of the NASA endpoint and alerts are printed instead of
+published to SNS. The first file only seeds the snapshot, as on a cold start in Lambda. No
+network access is needed, though AWS_DEFAULT_REGION must be set for the boto3 clients, e.g.:
+
+    python -m lambda_functions.near_real_time_function.local_runner \
+        --subscribers subscribers.json --interval 0 poll1.csv poll2.csv poll3.csv
+
+The subscribers file is a location table artifact or a JSON list of objects with zip_code,
+sns_topic_arn, latitude and longitude, plus optional alert_radius_miles and frp_threshold.
+"""
+import argparse
+import pandas as pd
+from lambda_functions.utils.streaming_utils import run_stream
+from lambda_functions.utils.replay_utils import load_subscribers
+
+def make_csv_fetcher(paths):
+    """Return a fetch function that reads one CSV per call, repeating the last once exhausted."""
+    remaining = list(paths)
+
+    def fetch():
+        path = remaining.pop(0) if len(remaining) > 1 else remaining[0]
+        data = pd.read_csv(path)
+        data['frp'] = pd.to_numeric(data['frp'], errors='coerce')
+        return data.dropna(subset=['frp'])
+
+    return fetch
+
+def print_alert(fires, email, topic_arn, message=None):
+    print(f"ALERT {topic_arn}: {len(fires)} new fires")
+    if message:
+        print(message)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the near-real-time alert loop offline.")
+    parser.add_argument("snapshots", nargs="+", help="FIRMS CSV files, one per poll")
+    parser.add_argument("--subscribers", required=True, help="Location table artifact or JSON list of subscribers")
+    parser.add_argument("--interval", type=float, default=0, help="Seconds to sleep between polls")
+    parser.add_argument("--ticks", type=int, default=None, help="Number of polls (defaults to one per file)")
+    args = parser.parse_args()
+
+    run_stream(
+        load_subscribers(args.subscribers),
+        fetch=make_csv_fetcher(args.snapshots),
+        send_alert=print_alert,
+        interval_seconds=args.interval,
+        max_ticks=args.ticks or len(args.snapshots)
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import json
+import logging
+from lambda_functions.utils.dynamodb_utils import (
+    save_subscriptions,
+    get_existing_subscriptions,
+    validate_subscription,
+    normalize_threshold
+)
+from lambda_functions.utils.sns_utils import (
+    get_or_create_sns_topics,
+    subscribe_users_to_topics,
+    unsubscribe_users_from_topics
+)
+from lambda_functions.utils.location_table_utils import record_pending_locations
+
+# Set up logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# S3 bucket holding the subscriber location table, optional for onboarding
+BUCKET_NAME = os.environ.get('BUCKET_NAME')
+
+def parse_records(records):
+    """Parse queued sign-ups into (message_id, email, topic_key) tuples, where topic_key is
+    (zip_code, alert_radius_miles, frp_threshold). Malformed ones are dropped since retrying cannot succeed."""
+    requests = []
+    for record in records:
+        try:
+            body = json.loads(record["body"])
+            zip_code = body.get("zip_code")
+            alert_radius_miles = body.get("alert_radius_miles")
+            frp_threshold = body.get("frp_threshold")
+            validate_subscription(body.get("email"), zip_code,
+                                  alert_radius_miles=alert_radius_miles, frp_threshold=frp_threshold)
+            topic_key = (zip_code, normalize_threshold(alert_radius_miles), normalize_threshold(frp_threshold))
+            requests.append((record["messageId"], body["email"], topic_key))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("Dropping invalid onboarding message %s: %s", record.get("messageId"), str(e))
+    return requests
+
+def record_subscriber_locations(topics):
+    """Queue this batch's topics for the precomputed table, to be geocoded and merged in a later compaction."""
+    if not BUCKET_NAME or not topics:
+        return
+
+    try:
+        record_pending_locations(BUCKET_NAME, [
+            {
+                "topic_arn": topic_arn,
+                "zip_code": zip_code,
+                "alert_radius_miles": alert_radius_miles,
+                "frp_threshold": frp_threshold
+            }
+            for (zip_code, alert_radius_miles, frp_threshold), topic_arn in topics.items()
+        ])
+    except Exception as e:
+        logger.warning("Failed to record subscriber locations: %s", str(e))
+
+def lambda_handler(event, context):
+    records = event.get("Records", [])
+    logger.info("Processing %d queued subscription requests...", len(records))
+
+    requests = parse_records(records)
+    if not requests:
+        return {"batchItemFailures": []}
+
+    try:
+        # One topic listing for the whole batch, creating topics only for new zip code and threshold pairs
+        topics = get_or_create_sns_topics(topic_key for _, _, topic_key in requests)
+
+        # Keep the latest request per (email, zip code) so the batch write has no duplicate keys
+        unique = {(email, topic_key[0]): topic_key for _, email, topic_key in requests}
+
+        # Subscribers whose thresholds changed leave their previous topic before the saved item is
+        # replaced; those that could not be moved are retried with their item untouched
+        existing = get_existing_subscriptions(list(unique))
+        previous_topics = {
+            pair: existing[pair].get("sns_topic_arn")
+            for pair, topic_key in unique.items()
+            if pair in existing and existing[pair].get("sns_topic_arn") not in (None, topics[topic_key])
+        }
+        failed_moves = set(unsubscribe_users_from_topics([(pair[0], arn) for pair, arn in previous_topics.items()]))
+        unmoved = {pair for pair, arn in previous_topics.items() if (pair[0], arn) in failed_moves}
+        if unmoved:
+            logger.warning("Failed to move %d users off their previous topics, returning them to the queue",
+                           len(unmoved))
+        unique = {pair: topic_key for pair, topic_key in unique.items() if pair not in unmoved}
+
+        save_subscriptions([
+            (email, zip_code, topics[topic_key], topic_key[1], topic_key[2])
+            for (email, zip_code), topic_key in unique.items()
+        ])
+        logger.info("Saved %d subscriptions", len(unique))
+
+    except Exception as e:
+        logger.error("Error processing onboarding batch: %s", str(e), exc_info=True)
+        return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id, _, _ in requests]}
+
+    failed = subscribe_users_to_topics([(email, topics[topic_key]) for (email, _), topic_key in unique.items()])
+    if failed:
+        logger.warning("Failed to subscribe %d users, returning them to the queue", len(failed))
+
+    record_subscriber_locations(topics)
+
+    # Only the failed subscribes and moves are retried; saving and subscribing again is idempotent
+    failed_keys = {(email, topic_arn) for email, topic_arn in failed}
+    return {"batchItemFailures": [
+        {"itemIdentifier": message_id}
+        for message_id, email, topic_key in requests
+        if (email, topics[topic_key]) in failed_keys or (email, topic_key[0]) in unmoved
+    ]}
@@ -0,0 +1,52 @@
+"""Run sign-ups through async onboarding locally, with the in-process queue standing in for SQS.
+
+Each request goes to UserOnboardingFunction, which queues it to local_queue when ONBOARDING_MODE=local,
+and the queue is then drained into OnboardingWorkerFunction in SQS-sized batches, as the SQS trigger
+would deliver them. The worker still creates real topics and subscriptions, so AWS credentials,
+AWS_DEFAULT_REGION and DYNAMODB_TABLE_NAME must be set (BUCKET_NAME is optional), e.g.:
+
+    ONBOARDING_MODE=local python -m lambda_functions.onboarding_worker_function.local_runner requests.json
+
+The requests file is a JSON list of sign-up bodies with email and zip_code, plus optional
+alert_radius_miles and frp_threshold.
+"""
+import sys
+import json
+import argparse
+from lambda_functions.utils.queue_utils import local_queue
+from lambda_functions.user_onboarding_function import lambda_function as user_onboarding
+from lambda_functions.onboarding_worker_function import lambda_function as onboarding_worker
+
+SQS_BATCH_SIZE = 10  # Records per worker invocation, the default batch size of an SQS trigger
+
+def drain_local_queue(batch_size=SQS_BATCH_SIZE):
+    """Hand everything in local_queue to the worker in batches and return the message IDs that failed."""
+    failed = []
+    while len(local_queue):
+        response = onboarding_worker.lambda_handler({"Records": local_queue.drain(batch_size)}, None)
+        failed.extend(item["itemIdentifier"] for item in response["batchItemFailures"])
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Run sign-ups through local async onboarding.")
+    parser.add_argument("requests", help="JSON list of sign-up request bodies")
+    parser.add_argument("--batch-size", type=int, default=SQS_BATCH_SIZE, help="Records per worker invocation")
+    args = parser.parse_args()
+
+    if user_onboarding.ONBOARDING_MODE != "local":
+        parser.error("ONBOARDING_MODE=local must be set so sign-ups are queued in process")
+
+    with open(args.requests) as f:
+        requests = json.load(f)
+
+    for request in requests:
+        response = user_onboarding.lambda_handler({"body": json.dumps(request)}, None)
+        print(f"{request.get('email')} ({request.get('zip_code')}): {response['statusCode']}")
+
+    failed = drain_local_queue(args.batch_size)
+    print(f"Submitted {len(requests)} requests, {len(failed)} failed in the worker")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
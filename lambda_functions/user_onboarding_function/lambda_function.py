@@ -1,13 +1,63 @@
 import os
 import json
 import logging
-from lambda_functions.utils.dynamodb_utils import save_subscription
-from lambda_functions.utils.sns_utils import get_or_create_sns_topic, subscribe_user_to_topic
+from lambda_functions.utils.dynamodb_utils import (
+    save_subscription,
+    get_subscription,
+    validate_subscription,
+    normalize_threshold
+)
+from lambda_functions.utils.queue_utils import enqueue_onboarding_request
+from lambda_functions.utils.sns_utils import (
+    get_or_create_sns_topic,
+    subscribe_user_to_topic,
+    unsubscribe_user_from_topic
+)
+from lambda_functions.utils.location_table_utils import record_pending_locations
 
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# S3 bucket holding the subscriber location table, optional for onboarding
+BUCKET_NAME = os.environ.get('BUCKET_NAME')
+
+# "async" validates and queues sign-ups to SQS for the onboarding worker instead of processing them inline;
+# "local" queues them to the in-process stand-in instead, for running without SQS
+ONBOARDING_MODE = os.environ.get('ONBOARDING_MODE', 'sync')
+
+def record_subscriber_location(zip_code, topic_arn, alert_radius_miles=None, frp_threshold=None):
+    """Queue the subscriber's topic for the precomputed table. Failures only delay it to the next daily run.
+
+    Only one small object is written here; geocoding and merging into the table happen in a later compaction.
+    """
+    if not BUCKET_NAME:
+        return
+
+    try:
+        record_pending_locations(BUCKET_NAME, [{
+            "topic_arn": topic_arn,
+            "zip_code": zip_code,
+            "alert_radius_miles": alert_radius_miles,
+            "frp_threshold": frp_threshold
+        }])
+    except Exception as e:
+        logger.warning("Failed to record location for zip_code %s: %s", zip_code, str(e))
+
+def queue_subscription(email, zip_code, alert_radius_miles=None, frp_threshold=None):
+    """Hand a validated sign-up to the onboarding worker, responding without any SNS calls."""
+    enqueue_onboarding_request(email, zip_code, alert_radius_miles, frp_threshold, local=ONBOARDING_MODE == "local")
+    logger.info("Queued subscription: email=%s, zip_code=%s", email, zip_code)
+
+    return {
+        "statusCode": 202,
+        "body": json.dumps({
+            "message": "Subscription received! Check your email to confirm.",
+            "email": email,
+            "zip_code": zip_code
+        })
+    }
+
 def lambda_handler(event, context):
     logger.info("Processing subscription request...")
 
@@ -26,15 +76,48 @@ def lambda_handler(event, context):
                 })
             }
 
-        topic_arn = get_or_create_sns_topic(zip_code)
+        # Optional per-subscriber thresholds; unset values use the defaults
+        alert_radius_miles = body.get("alert_radius_miles")
+        frp_threshold = body.get("frp_threshold")
+
+        try:
+            validate_subscription(email, zip_code, alert_radius_miles=alert_radius_miles, frp_threshold=frp_threshold)
+        except ValueError as e:
+            logger.warning("Invalid subscription request: %s", str(e))
+            return {
+                "statusCode": 400,
+                "body": json.dumps({
+                    "error": "Invalid subscription request",
+                    "message": str(e)
+                })
+            }
+
+        # Round to the stored precision so the topic name and the saved thresholds agree
+        alert_radius_miles = normalize_threshold(alert_radius_miles)
+        frp_threshold = normalize_threshold(frp_threshold)
+
+        if ONBOARDING_MODE in ("async", "local"):
+            return queue_subscription(email, zip_code, alert_radius_miles, frp_threshold)
+
+        topic_arn = get_or_create_sns_topic(zip_code, alert_radius_miles, frp_threshold)
         logger.info("SNS topic ARN for zip code %s: %s", zip_code, topic_arn)
 
-        save_subscription(email, zip_code, topic_arn)
+        # A subscriber changing thresholds moves to another topic, so leave the previous one first;
+        # the saved item is only replaced once that succeeded, so a retry can still find it
+        previous = get_subscription(email, zip_code)
+        previous_topic_arn = previous.get("sns_topic_arn") if previous else None
+        if previous_topic_arn and previous_topic_arn != topic_arn:
+            unsubscribe_user_from_topic(email, previous_topic_arn)
+            logger.info("Unsubscribed user from previous SNS topic: email=%s", email)
+
+        save_subscription(email, zip_code, topic_arn, alert_radius_miles, frp_threshold)
         logger.info("Saved subscription: email=%s, zip_code=%s", email, zip_code)
 
         subscribe_user_to_topic(email, topic_arn)
         logger.info("Subscribed user to SNS topic: email=%s", email)
 
+        record_subscriber_location(zip_code, topic_arn, alert_radius_miles, frp_threshold)
+
         return {
             "statusCode": 200,
             "body": json.dumps({
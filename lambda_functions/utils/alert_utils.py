@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+from lambda_functions.utils.cache_utils import LRUCache
+
+GRID_SIZE = 0.0725  # Degrees per fallback clustering cell (~5 miles) for fires without a cluster_id
+MAX_ALERT_CLUSTERS = 10  # Clusters rendered in full; the rest go into a summary line
+MAX_MESSAGE_BYTES = 256 * 1024  # SNS message size limit
+RECENCY_HALF_LIFE_HOURS = 12  # A cluster's score halves for every 12 hours it is older than the newest one
+DISTANCE_SCALE_MILES = 100  # A cluster this far away scores half as much as one at the subscriber's location
+EARTH_RADIUS_MILES = 3958.8
+CLUSTER_CACHE_SIZE = 4096
+
+# Aggregates cluster_fires stores on every fire, prefixed with "cluster_"
+AGGREGATE_COLUMNS = ['center_lat', 'center_lon', 'fire_count', 'total_frp', 'max_frp', 'latest']
+
+# Rendered cluster bodies keyed by cluster contents, shared across topics and runs
+cluster_render_cache = LRUCache(CLUSTER_CACHE_SIZE)
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+def detection_times(fires):
+    """Detection timestamps from acq_date and the HHMM acq_time, or NaT where they are missing."""
+    if 'acq_date' not in fires.columns:
+        return pd.Series(pd.NaT, index=fires.index)
+    times = pd.to_datetime(fires['acq_date'], errors='coerce')
+    if 'acq_time' in fires.columns:
+        hhmm = pd.to_numeric(fires['acq_time'], errors='coerce').fillna(0).astype(int)
+        times = times + pd.to_timedelta(hhmm // 100, unit='h') + pd.to_timedelta(hhmm % 100, unit='m')
+    return times
+
+def aggregate_clusters(fires, keys):
+    """Per-cluster center, fire count, total and max FRP and latest detection, one row per key."""
+    fires = fires.assign(detected_at=detection_times(fires))
+    return fires.groupby(keys, sort=False).agg(
+        center_lat=('latitude', 'mean'),
+        center_lon=('longitude', 'mean'),
+        fire_count=('frp', 'size'),
+        total_frp=('frp', 'sum'),
+        max_frp=('frp', 'max'),
+        latest=('detected_at', 'max')
+    ).reset_index()
+
+def group_clusters(fires):
+    """Group fires into clusters with aggregate FRP, fire count and latest detection.
+
+    Fires labelled by cluster_fires carry their cluster's aggregates over the whole snapshot, so
+    every alert naming a cluster shows the same figures and only the cluster IDs are selected
+    here. Fires with only a cluster_id are aggregated by it; others fall back to fixed grid cells.
+    """
+    stored = {f"cluster_{column}": column for column in AGGREGATE_COLUMNS}
+    if 'cluster_id' in fires.columns and set(stored) <= set(fires.columns):
+        grouped = fires.drop_duplicates('cluster_id')[['cluster_id', *stored]].rename(columns=stored)
+    elif 'cluster_id' in fires.columns:
+        grouped = aggregate_clusters(fires, ['cluster_id'])
+    else:
+        grouped = aggregate_clusters(fires.assign(
+            cluster_lat=np.round(fires['latitude'] / GRID_SIZE) * GRID_SIZE,
+            cluster_lon=np.round(fires['longitude'] / GRID_SIZE) * GRID_SIZE
+        ), ['cluster_lat', 'cluster_lon'])
+
+    return [
+        {
+            "id": getattr(row, 'cluster_id', None),
+            "center": (float(row.center_lat), float(row.center_lon)),
+            "count": int(row.fire_count),
+            "total_frp": float(row.total_frp),
+            "max_frp": float(row.max_frp),
+            "latest": row.latest
+        }
+        for row in grouped.itertuples(index=False)
+    ]
+
+def rank_clusters(clusters, lat=None, lon=None):
+    """Order clusters by aggregate FRP, discounted by distance to the subscriber and by age."""
+    if not clusters:
+        return []
+
+    total_frp = np.array([cluster["total_frp"] for cluster in clusters])
+    score = total_frp.copy()
+
+    if lat is not None and lon is not None:
+        centers = np.array([cluster["center"] for cluster in clusters])
+        distance = haversine_miles(lat, lon, centers[:, 0], centers[:, 1])
+        score = score / (1 + distance / DISTANCE_SCALE_MILES)
+
+    latest = pd.Series([cluster["latest"] for cluster in clusters], dtype='datetime64[ns]')
+    if latest.notna().any():
+        age_hours = ((latest.max() - latest).dt.total_seconds() / 3600).fillna(0).to_numpy()
+        score = score * 0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS)
+
+    order = np.argsort(-score, kind='stable')
+    return [clusters[i] for i in order]
+
+def render_cluster(cluster):
+    """Render one cluster's alert body, reusing the cached text for identical clusters."""
+    key = (cluster["id"], cluster["center"], cluster["count"], cluster["total_frp"], cluster["max_frp"],
+           str(cluster["latest"]))
+    body = cluster_render_cache.get(key)
+    if body is None:
+        detected = "unknown" if pd.isna(cluster["latest"]) else cluster["latest"].strftime('%Y-%m-%d %H:%M UTC')
+        body = (
+            (f"Cluster: {cluster['id']}\n" if cluster["id"] else "") +
+            f"Location: {cluster['center'][0]:.4f}, {cluster['center'][1]:.4f}\n"
+            f"Fires in cluster: {cluster['count']}\n"
+            f"Total FRP: {cluster['total_frp']:.1f} MW (max {cluster['max_frp']:.1f} MW)\n"
+            f"Latest detection: {detected}"
+        )
+        cluster_render_cache.put(key, body)
+    return body
+
+def build_alert_message(fires, lat=None, lon=None, max_clusters=MAX_ALERT_CLUSTERS, max_bytes=MAX_MESSAGE_BYTES):
+    """Render the most severe clusters in full and summarize the rest, staying within max_bytes."""
+    if fires.empty:
+        return None
+
+    ranked = rank_clusters(group_clusters(fires), lat, lon)
+    header = f"🔥 Wildfire Alert!\n{len(ranked)} fire clusters detected near you."
+    summary_reserve = 256  # Room kept for the summary line
+
+    sections = [header]
+    size = len(header.encode('utf-8'))
+    shown = 0
+    for cluster in ranked[:max_clusters]:
+        section = render_cluster(cluster)
+        if lat is not None and lon is not None:
+            distance = haversine_miles(lat, lon, cluster["center"][0], cluster["center"][1])
+            section += f"\nDistance: {distance:.0f} miles"
+        section_size = len(section.encode('utf-8')) + 2
+        if size + section_size + summary_reserve > max_bytes:
+            break
+        sections.append(section)
+        size += section_size
+        shown += 1
+
+    rest = ranked[shown:]
+    if rest:
+        sections.append(
+            f"...and {len(rest)} more clusters "
+            f"({sum(c['count'] for c in rest)} fires, total FRP {sum(c['total_frp'] for c in rest):.1f} MW)."
+        )
+
+    return "\n\n".join(sections)
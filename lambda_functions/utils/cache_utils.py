@@ -0,0 +1,35 @@
+from collections import OrderedDict
+
+class LRUCache:
+    """Small in-memory LRU cache. Module-level instances survive across warm Lambda invocations."""
+
+    def __init__(self, maxsize):
+        if maxsize <= 0:
+            raise ValueError(f"Cache size must be positive: {maxsize}")
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._items:
+            return default
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+def make_match_key(snapshot_version, lat, lon, radius_miles, frp_threshold, precision=2):
+    """Build the cache key for a fire match: nearby locations round to the same key."""
+    return (snapshot_version, round(lat, precision), round(lon, precision), radius_miles, frp_threshold)
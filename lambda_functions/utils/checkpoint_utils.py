@@ -0,0 +1,74 @@
+import json
+from datetime import datetime
+import boto3
+import botocore.exceptions
+
+s3 = boto3.client('s3')
+lambda_client = boto3.client('lambda')
+
+CHECKPOINT_PREFIX = 'checkpoints'
+MAX_CONTINUATIONS = 20  # Upper bound on self re-invocations of one run, so a stuck run cannot loop forever
+
+def get_run_id(event):
+    """Identify a monitoring run by the date of its scheduled event, so retries share a checkpoint."""
+    event_time = event.get('time')
+    run_date = event_time[:10] if event_time else datetime.now().strftime('%Y-%m-%d')
+    return f"daily-{run_date}"
+
+def new_checkpoint(run_id):
+    return {"run_id": run_id, "cursor": None, "processed_topics": [], "failed_topics": [], "completed": False}
+
+def load_checkpoint(bucket_name, run_id):
+    """Load the checkpoint for a run from S3, or None if the run has not started yet."""
+    try:
+        response = s3.get_object(Bucket=bucket_name, Key=f"{CHECKPOINT_PREFIX}/{run_id}.json")
+        return json.loads(response["Body"].read())
+    except botocore.exceptions.ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "NoSuchKey":
+            print(f"Failed to load checkpoint for run {run_id}: {e}")
+            raise
+        return None
+
+def save_checkpoint(bucket_name, run_id, cursor, processed_topics, failed_topics=(), completed=False):
+    """Persist the scan cursor, processed topics and topics whose alert failed of a run to S3."""
+    checkpoint = {
+        "run_id": run_id,
+        "cursor": cursor,
+        "processed_topics": sorted(processed_topics),
+        "failed_topics": sorted(failed_topics),
+        "completed": completed,
+        "updated_at": datetime.now().isoformat()
+    }
+
+    try:
+        s3.put_object(
+            Bucket=bucket_name,
+            Key=f"{CHECKPOINT_PREFIX}/{run_id}.json",
+            Body=json.dumps(checkpoint)
+        )
+        print(f"Saved checkpoint for run {run_id}: {len(processed_topics)} topics processed")
+    except Exception as e:
+        print(f"Failed to save checkpoint for run {run_id}: {str(e)}")
+        raise
+
+def continue_run(function_name, event):
+    """Re-invoke the function asynchronously with the same event, so it resumes the same run's checkpoint.
+
+    Returns False without invoking once the run has used up MAX_CONTINUATIONS.
+    """
+    continuation = event.get('continuation', 0) + 1
+    if continuation > MAX_CONTINUATIONS:
+        print(f"Run {get_run_id(event)} reached {MAX_CONTINUATIONS} continuations, not re-invoking")
+        return False
+
+    try:
+        lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType='Event',
+            Payload=json.dumps({**event, 'continuation': continuation})
+        )
+        print(f"Re-invoked {function_name} to continue run {get_run_id(event)} ({continuation}/{MAX_CONTINUATIONS})")
+        return True
+    except Exception as e:
+        print(f"Failed to re-invoke {function_name} for run {get_run_id(event)}: {str(e)}")
+        raise
@@ -0,0 +1,89 @@
+import hashlib
+import numpy as np
+from lambda_functions.utils.wildfire_utils import MILES_PER_DEGREE
+from lambda_functions.utils.alert_utils import detection_times, aggregate_clusters, AGGREGATE_COLUMNS
+
+CLUSTER_EPS_MILES = 5.0  # Fires within 5 miles of each other belong to the same cluster
+
+def _neighbour_edges(lat, lon, eps_miles):
+    """Pairs of fires within eps of each other, only comparing fires in the same or adjacent grid cells."""
+
+    # Cells are eps tall and at least eps wide everywhere in the snapshot: their width in degrees
+    # is set at the highest latitude, where a degree of longitude is shortest
+    lon_scale = MILES_PER_DEGREE * np.cos(np.radians(np.abs(lat).max()))
+    cell_x = np.floor(lon * lon_scale / eps_miles).astype(np.int64)
+    cell_y = np.floor(lat * MILES_PER_DEGREE / eps_miles).astype(np.int64)
+
+    cells = {}
+    for index, cell in enumerate(zip(cell_x.tolist(), cell_y.tolist())):
+        cells.setdefault(cell, []).append(index)
+    cells = {cell: np.array(members) for cell, members in cells.items()}
+
+    # Each unordered pair of adjacent cells is visited once
+    offsets = [(0, 0), (1, -1), (1, 0), (1, 1), (0, 1)]
+    sources, targets = [], []
+    for (cx, cy), members in cells.items():
+        for dx, dy in offsets:
+            others = cells.get((cx + dx, cy + dy))
+            if others is None:
+                continue
+
+            # Equirectangular distance, scaling longitude at each pair's mean latitude
+            lat_a, lat_b = lat[members][:, None], lat[others][None, :]
+            dy_miles = (lat_a - lat_b) * MILES_PER_DEGREE
+            dx_miles = (lon[members][:, None] - lon[others][None, :]) * MILES_PER_DEGREE * \
+                np.cos(np.radians((lat_a + lat_b) / 2))
+            i, j = np.nonzero(dx_miles ** 2 + dy_miles ** 2 <= eps_miles ** 2)
+            sources.append(members[i])
+            targets.append(others[j])
+
+    if not sources:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(sources), np.concatenate(targets)
+
+def _connected_components(n, sources, targets):
+    """Label each node with the smallest index in its component, by min-label propagation."""
+    labels = np.arange(n)
+    while True:
+        previous = labels.copy()
+        np.minimum.at(labels, sources, labels[targets])
+        np.minimum.at(labels, targets, labels[sources])
+        labels = labels[labels]  # Pointer jumping
+        if np.array_equal(labels, previous):
+            return labels
+
+def _cluster_id(lat, lon, detected):
+    digest = hashlib.sha1(f"{lat:.4f}|{lon:.4f}|{detected}".encode('utf-8')).hexdigest()
+    return f"WF-{digest[:8]}"
+
+def cluster_fires(data, eps_miles=CLUSTER_EPS_MILES):
+    """Assign a cluster_id to every fire in a snapshot by connecting fires within eps_miles.
+
+    This is DBSCAN with min_samples=1 (isolated fires form their own cluster). IDs are derived
+    from each cluster's earliest detection, so a cluster keeps its ID as later detections join it.
+    Each fire also carries its cluster's aggregates over the whole snapshot (cluster_fire_count,
+    cluster_total_frp, ...), computed once here so alerts only select which clusters to show.
+    """
+    data = data.copy()
+    if data.empty:
+        data['cluster_id'] = []
+        for column in AGGREGATE_COLUMNS:
+            data[f"cluster_{column}"] = []
+        return data
+
+    lat = data['latitude'].to_numpy(dtype=np.float64)
+    lon = data['longitude'].to_numpy(dtype=np.float64)
+    labels = _connected_components(len(data), *_neighbour_edges(lat, lon, eps_miles))
+
+    # Anchor each cluster on its earliest detection, breaking ties by position
+    detected = detection_times(data).astype(str).to_numpy(dtype=str)
+    order = np.lexsort((lon, lat, detected, labels))
+    first = order[np.r_[True, labels[order][1:] != labels[order][:-1]]]
+
+    ids = {labels[i]: _cluster_id(lat[i], lon[i], detected[i]) for i in first.tolist()}
+    data['cluster_id'] = [ids[label] for label in labels.tolist()]
+
+    aggregates = aggregate_clusters(data, ['cluster_id']).set_index('cluster_id')
+    for column in AGGREGATE_COLUMNS:
+        data[f"cluster_{column}"] = data['cluster_id'].map(aggregates[column]).to_numpy()
+    return data
@@ -1,13 +1,27 @@
 import os
+import math
 import boto3
 from datetime import datetime
+from decimal import Decimal
 
 dynamodb = boto3.resource('dynamodb')
 DYNAMODB_TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
 subscription_table = dynamodb.Table(DYNAMODB_TABLE_NAME)
 
-def save_subscription(email, zip_code, topic_arn):
-    """Save user subscription details to DynamoDB."""
+MAX_ALERT_RADIUS_MILES = 500  # Largest custom alert radius a subscriber may choose
+MAX_FRP_THRESHOLD = 10000  # Largest custom FRP threshold in MW, above any fire FIRMS reports
+THRESHOLD_DECIMALS = 1  # Custom thresholds are stored, and name their topic, at this precision
+BATCH_GET_SIZE = 100  # Most keys DynamoDB accepts in one BatchGetItem request
+
+def _is_number(value):
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool) and math.isfinite(value)
+
+def normalize_threshold(value):
+    """Round a validated custom threshold to its canonical precision, leaving None unset."""
+    return None if value is None else round(float(value), THRESHOLD_DECIMALS)
+
+def validate_subscription(email, zip_code, topic_arn=None, alert_radius_miles=None, frp_threshold=None):
+    """Raise ValueError if the subscription fields are invalid. Optional fields are only checked when given."""
 
     if not email or "@" not in email:
         raise ValueError(f"Invalid email: {email}")
@@ -15,23 +29,105 @@ def save_subscription(email, zip_code, topic_arn):
     if not zip_code or not zip_code.strip().isdigit():
         raise ValueError(f"Invalid zip code: {zip_code}")
 
-    if not topic_arn or not topic_arn.startswith("arn:aws:sns"):
+    if topic_arn is not None and not topic_arn.startswith("arn:aws:sns"):
         raise ValueError(f"Invalid SNS topic ARN: {topic_arn}")
 
+    if alert_radius_miles is not None and (
+            not _is_number(alert_radius_miles) or not 0 < alert_radius_miles <= MAX_ALERT_RADIUS_MILES):
+        raise ValueError(f"Invalid alert radius: {alert_radius_miles}")
+
+    if frp_threshold is not None and (
+            not _is_number(frp_threshold) or not 0 <= frp_threshold <= MAX_FRP_THRESHOLD):
+        raise ValueError(f"Invalid FRP threshold: {frp_threshold}")
+
+def _subscription_item(email, zip_code, topic_arn, alert_radius_miles=None, frp_threshold=None):
+    item = {
+        'email': email,
+        'zip_code': zip_code,
+        'sns_topic_arn': topic_arn,
+        'subscription_date': datetime.now().strftime('%Y-%m-%d')
+    }
+
+    # Custom thresholds are only stored when set; DynamoDB numbers must be Decimals
+    if alert_radius_miles is not None:
+        item['alert_radius_miles'] = Decimal(str(normalize_threshold(alert_radius_miles)))
+    if frp_threshold is not None:
+        item['frp_threshold'] = Decimal(str(normalize_threshold(frp_threshold)))
+    return item
+
+def _subscription_key(email, zip_code):
+    """Primary key of a subscription item, following the table's key schema."""
+    attributes = {'email': email, 'zip_code': zip_code}
+    return {key['AttributeName']: attributes[key['AttributeName']] for key in subscription_table.key_schema}
+
+def get_subscription(email, zip_code):
+    """Return the stored subscription that saving (email, zip_code) would overwrite, or None."""
+
+    try:
+        response = subscription_table.get_item(Key=_subscription_key(email, zip_code))
+        return response.get('Item')
+    except Exception as e:
+        print(f"Failed to get subscription for {email}: {str(e)}")
+        raise
+
+def get_existing_subscriptions(pairs):
+    """Return the stored subscriptions that saving these (email, zip_code) pairs would overwrite,
+    as a dict keyed by pair, using batched reads."""
+
+    key_names = [key['AttributeName'] for key in subscription_table.key_schema]
+    keys = {pair: _subscription_key(*pair) for pair in set(pairs)}
+    unique_keys = list({tuple(sorted(key.items())): key for key in keys.values()}.values())
+    items = {}
+
+    try:
+        for start in range(0, len(unique_keys), BATCH_GET_SIZE):
+            request = {DYNAMODB_TABLE_NAME: {'Keys': unique_keys[start:start + BATCH_GET_SIZE]}}
+            while request:
+                response = dynamodb.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(DYNAMODB_TABLE_NAME, []):
+                    item_key = {name: item[name] for name in key_names}
+                    items[tuple(sorted(item_key.items()))] = item
+                request = response.get('UnprocessedKeys')
+    except Exception as e:
+        print(f"Failed to get {len(unique_keys)} subscriptions: {str(e)}")
+        raise
+
+    return {
+        pair: items[tuple(sorted(key.items()))]
+        for pair, key in keys.items()
+        if tuple(sorted(key.items())) in items
+    }
+
+def save_subscription(email, zip_code, topic_arn, alert_radius_miles=None, frp_threshold=None):
+    """Save user subscription details, including any custom alert thresholds, to DynamoDB."""
+
+    validate_subscription(email, zip_code, topic_arn or "", alert_radius_miles, frp_threshold)
+
     try:
         subscription_table.put_item(
-            Item={
-                'email': email,
-                'zip_code': zip_code,
-                'sns_topic_arn': topic_arn,
-                'subscription_date': datetime.now().strftime('%Y-%m-%d')
-            }
+            Item=_subscription_item(email, zip_code, topic_arn, alert_radius_miles, frp_threshold)
         )
         print(f"Saved subscription for {email} to DynamoDB")
     except Exception as e:
         print(f"Failed to save subscription for {email}: {str(e)}")
         raise
 
+def save_subscriptions(subscriptions):
+    """Save a batch of (email, zip_code, topic_arn[, alert_radius_miles, frp_threshold]) subscriptions
+    to DynamoDB with batched writes."""
+
+    for subscription in subscriptions:
+        validate_subscription(subscription[0], subscription[1], subscription[2] or "", *subscription[3:])
+
+    try:
+        with subscription_table.batch_writer() as batch:
+            for subscription in subscriptions:
+                batch.put_item(Item=_subscription_item(*subscription))
+        print(f"Saved {len(subscriptions)} subscriptions to DynamoDB")
+    except Exception as e:
+        print(f"Failed to save {len(subscriptions)} subscriptions: {str(e)}")
+        raise
+
 def get_subscriptions():
     """Retrieve all active subscriptions from DynamoDB."""
 
@@ -47,3 +143,19 @@ def get_subscriptions():
     except Exception as e:
         print(f"Failed to get subscriptions: {str(e)}")
         return []
+
+def scan_subscriptions_page(exclusive_start_key=None, page_size=None):
+    """Scan one page of subscriptions, returning (items, last_evaluated_key)."""
+
+    scan_kwargs = {}
+    if exclusive_start_key:
+        scan_kwargs['ExclusiveStartKey'] = exclusive_start_key
+    if page_size:
+        scan_kwargs['Limit'] = page_size
+
+    try:
+        response = subscription_table.scan(**scan_kwargs)
+        return response.get('Items', []), response.get('LastEvaluatedKey')
+    except Exception as e:
+        print(f"Failed to scan subscriptions: {str(e)}")
+        raise
@@ -14,7 +14,7 @@ def get_coordinates(zip_code):
 
     try:
         url = f"https://api.opencagedata.com/geocode/v1/json?q={zip_code}&key={api_key}&countrycode=us"
-        response = requests.get(url)
+        response = requests.get(url, timeout=10)
         response.raise_for_status()
         data = response.json()
 
@@ -0,0 +1,352 @@
+import json
+import struct
+import hashlib
+import numpy as np
+import boto3
+import botocore.exceptions
+from lambda_functions.utils.geolocation_utils import get_coordinates
+from lambda_functions.utils.wildfire_utils import MILES_PER_DEGREE, ALERT_RADIUS_MILES, FRP_THRESHOLD
+
+s3 = boto3.client('s3')
+
+LOCATION_TABLE_KEY = 'artifacts/subscriber_locations.bin'
+LOCAL_TABLE_PATH = '/tmp/subscriber_locations.bin'
+PENDING_PREFIX = 'artifacts/pending_locations/'  # One small object per signed-up topic, awaiting compaction
+UPSERT_RETRIES = 3
+MAX_COMPACT_KEYS = 500  # Queued topics handled per compaction; the rest wait for the next one
+COMPACT_BATCH_SIZE = 100  # Queued topics geocoded, merged and removed per table upsert
+
+# Binary layout: header, one 4-byte column of n values per entry in COLUMNS, JSON metadata
+HEADER_FORMAT = '<4sIII'  # magic, format version, row count, metadata length
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+MAGIC = b'WFLT'
+FORMAT_VERSION = 1
+COLUMNS = [
+    ('lat', np.float32),
+    ('lon', np.float32),
+    ('topic_index', np.int32),
+    ('cell', np.int32),
+    ('radius', np.float32),
+    ('frp', np.float32)
+]
+
+# Grid cells are one default alert radius wide; larger radii search further out
+CELL_DEGREES = ALERT_RADIUS_MILES / MILES_PER_DEGREE
+CELL_COLUMNS = int(np.ceil(360 / CELL_DEGREES))
+MATCH_CHUNK_SIZE = 2048  # Subscribers compared against all fires per NumPy operation
+
+# Table loaded in this container and the S3 ETag it came from, reused across warm starts
+_loaded_table = None
+_loaded_etag = None
+
+def grid_cells(lat, lon):
+    """Grid cell index for each coordinate."""
+    rows = np.floor((np.asarray(lat, dtype=np.float64) + 90) / CELL_DEGREES).astype(np.int32)
+    cols = np.floor((np.asarray(lon, dtype=np.float64) + 180) / CELL_DEGREES).astype(np.int32)
+    return rows * CELL_COLUMNS + cols
+
+class LocationTable:
+    """Subscriber topic locations and thresholds as column arrays, memory-mapped when loaded from a file."""
+
+    def __init__(self, lat, lon, topic_index, cell, radius, frp, topics, zip_codes):
+        self.lat = lat
+        self.lon = lon
+        self.topic_index = topic_index
+        self.cell = cell
+        self.radius = radius
+        self.frp = frp
+        self.topics = topics
+        self.zip_codes = zip_codes
+        self._rows_by_topic = None
+
+    def __len__(self):
+        return len(self.lat)
+
+    def row_for_topic(self, topic_arn):
+        if self._rows_by_topic is None:
+            self._rows_by_topic = {self.topics[index]: row for row, index in enumerate(self.topic_index.tolist())}
+        return self._rows_by_topic.get(topic_arn)
+
+    def coordinates_for(self, topic_arn):
+        """Return (lat, lon) for a topic, or None if it is not in the table."""
+        row = self.row_for_topic(topic_arn)
+        if row is None:
+            return None
+        return float(self.lat[row]), float(self.lon[row])
+
+    def thresholds_for(self, topic_arn):
+        """Return (alert_radius_miles, frp_threshold) for a topic, or None if it is not in the table."""
+        row = self.row_for_topic(topic_arn)
+        if row is None:
+            return None
+        return float(self.radius[row]), float(self.frp[row])
+
+    def zip_code_for(self, topic_arn):
+        """Return the zip code of a topic, or None if it is not in the table."""
+        row = self.row_for_topic(topic_arn)
+        if row is None:
+            return None
+        return self.zip_codes[int(self.topic_index[row])]
+
+    def to_rows(self):
+        return [
+            {
+                "topic_arn": self.topics[index],
+                "zip_code": self.zip_codes[index],
+                "latitude": float(self.lat[row]),
+                "longitude": float(self.lon[row]),
+                "alert_radius_miles": float(self.radius[row]),
+                "frp_threshold": float(self.frp[row])
+            }
+            for row, index in enumerate(self.topic_index.tolist())
+        ]
+
+def build_location_table(rows):
+    """Compile subscriber locations (one per topic) into the binary table format, sorted by grid cell."""
+    rows = list({row["topic_arn"]: row for row in rows}.values())
+    topics = [row["topic_arn"] for row in rows]
+    zip_codes = [row["zip_code"] for row in rows]
+
+    lat = np.array([row["latitude"] for row in rows], dtype=np.float32)
+    lon = np.array([row["longitude"] for row in rows], dtype=np.float32)
+    radius = np.array([row.get("alert_radius_miles") or ALERT_RADIUS_MILES for row in rows], dtype=np.float32)
+    frp = np.array([FRP_THRESHOLD if row.get("frp_threshold") is None else row["frp_threshold"] for row in rows],
+                   dtype=np.float32)
+    cell = grid_cells(lat, lon).astype(np.int32)
+
+    # Store rows in cell order so subscribers of the same area are contiguous
+    order = np.argsort(cell, kind='stable')
+    metadata = json.dumps({"topics": topics, "zip_codes": zip_codes}).encode('utf-8')
+    header = struct.pack(HEADER_FORMAT, MAGIC, FORMAT_VERSION, len(rows), len(metadata))
+
+    return b''.join([
+        header,
+        lat[order].tobytes(),
+        lon[order].tobytes(),
+        order.astype(np.int32).tobytes(),
+        cell[order].tobytes(),
+        radius[order].tobytes(),
+        frp[order].tobytes(),
+        metadata
+    ])
+
+def _read_header(header):
+    magic, version, count, metadata_length = struct.unpack(HEADER_FORMAT, header)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Unsupported subscriber location table format")
+    return count, metadata_length
+
+def _make_table(read_column, metadata):
+    columns = {name: read_column(position, dtype) for position, (name, dtype) in enumerate(COLUMNS)}
+    return LocationTable(topics=metadata["topics"], zip_codes=metadata["zip_codes"], **columns)
+
+def parse_location_table(data):
+    """Read a table from bytes produced by build_location_table, without touching the filesystem."""
+    count, metadata_length = _read_header(data[:HEADER_SIZE])
+    metadata_offset = HEADER_SIZE + len(COLUMNS) * count * 4
+    metadata = json.loads(data[metadata_offset:metadata_offset + metadata_length])
+
+    def read_column(position, dtype):
+        return np.frombuffer(data, dtype=dtype, count=count, offset=HEADER_SIZE + position * count * 4)
+
+    return _make_table(read_column, metadata)
+
+def open_location_table(path):
+    """Memory-map a table file written by build_location_table."""
+    with open(path, 'rb') as f:
+        count, metadata_length = _read_header(f.read(HEADER_SIZE))
+        f.seek(HEADER_SIZE + len(COLUMNS) * count * 4)
+        metadata = json.loads(f.read(metadata_length))
+
+    def read_column(position, dtype):
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE + position * count * 4, shape=(count,))
+
+    return _make_table(read_column, metadata)
+
+def load_location_table(bucket_name):
+    """Load the table from S3, reusing the /tmp copy while its ETag is unchanged. None if not built yet."""
+    global _loaded_table, _loaded_etag
+
+    try:
+        etag = s3.head_object(Bucket=bucket_name, Key=LOCATION_TABLE_KEY)["ETag"]
+    except botocore.exceptions.ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+            print(f"Failed to check subscriber location table: {e}")
+            raise
+        print("Subscriber location table has not been built yet.")
+        return None
+
+    if _loaded_table is not None and etag == _loaded_etag:
+        return _loaded_table
+
+    try:
+        s3.download_file(bucket_name, LOCATION_TABLE_KEY, LOCAL_TABLE_PATH)
+        _loaded_table = open_location_table(LOCAL_TABLE_PATH)
+        _loaded_etag = etag
+        print(f"Loaded subscriber location table with {len(_loaded_table)} topics")
+        return _loaded_table
+    except Exception as e:
+        print(f"Failed to load subscriber location table: {str(e)}")
+        raise
+
+def upsert_subscriber_locations(bucket_name, rows):
+    """Merge subscriber locations into the table in S3, retrying if another writer updated it first."""
+    for attempt in range(UPSERT_RETRIES):
+        put_kwargs = {}
+        try:
+            response = s3.get_object(Bucket=bucket_name, Key=LOCATION_TABLE_KEY)
+            put_kwargs['IfMatch'] = response["ETag"]
+            existing = parse_location_table(response["Body"].read()).to_rows()
+        except botocore.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "NoSuchKey":
+                print(f"Failed to read subscriber location table: {e}")
+                raise
+            put_kwargs['IfNoneMatch'] = '*'
+            existing = []
+
+        try:
+            s3.put_object(
+                Bucket=bucket_name,
+                Key=LOCATION_TABLE_KEY,
+                Body=build_location_table(existing + list(rows)),
+                **put_kwargs
+            )
+            print(f"Upserted {len(rows)} subscriber locations")
+            return
+        except botocore.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("PreconditionFailed", "ConditionalRequestConflict"):
+                print(f"Failed to write subscriber location table: {e}")
+                raise
+            print(f"Subscriber location table changed concurrently, retrying ({attempt + 1}/{UPSERT_RETRIES})")
+
+    raise RuntimeError("Failed to upsert subscriber locations after concurrent updates")
+
+def record_pending_locations(bucket_name, rows):
+    """Queue subscriber topics for the table without reading or rewriting it.
+
+    Each row needs topic_arn and zip_code, plus any custom thresholds; coordinates are resolved
+    when compact_pending_locations merges it. Objects are keyed by topic, so writes are idempotent.
+    """
+    for row in rows:
+        key = f"{PENDING_PREFIX}{hashlib.sha1(row['topic_arn'].encode('utf-8')).hexdigest()}.json"
+        try:
+            s3.put_object(Bucket=bucket_name, Key=key, Body=json.dumps(row))
+        except Exception as e:
+            print(f"Failed to queue subscriber location for {row['zip_code']}: {str(e)}")
+            raise
+    print(f"Queued {len(rows)} subscriber locations")
+
+def _merge_pending_batch(bucket_name, rows, keys):
+    """Upsert one batch of geocoded queued rows and remove their queued objects."""
+    upsert_subscriber_locations(bucket_name, rows)
+
+    # Rewritten objects hold the same topic row, so deleting merged keys never loses a sign-up
+    s3.delete_objects(Bucket=bucket_name, Delete={"Objects": [{"Key": key} for key in keys]})
+
+def compact_pending_locations(bucket_name, should_stop=None):
+    """Geocode queued topics, merge them into the table in bounded batches and remove them.
+
+    At most MAX_COMPACT_KEYS topics are handled per call, and compaction stops early once
+    should_stop() returns True, merging what it has geocoded so far. Topics whose zip code cannot
+    be geocoded stay queued for a later compaction. Returns the number of locations merged.
+    """
+    keys = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=PENDING_PREFIX):
+        keys.extend(item["Key"] for item in page.get("Contents", []))
+        if len(keys) >= MAX_COMPACT_KEYS:
+            break
+    keys = keys[:MAX_COMPACT_KEYS]
+    if not keys:
+        return 0
+
+    coordinates_by_zip = {}
+    rows = []
+    batch_keys = []
+    merged = 0
+    for key in keys:
+        if should_stop is not None and should_stop():
+            print("Stopping compaction early, remaining subscriber locations stay queued")
+            break
+
+        row = json.loads(s3.get_object(Bucket=bucket_name, Key=key)["Body"].read())
+        zip_code = row["zip_code"]
+        if zip_code not in coordinates_by_zip:
+            try:
+                coordinates_by_zip[zip_code] = get_coordinates(zip_code)
+            except Exception as e:
+                print(f"Failed to geocode zip_code {zip_code}: {str(e)}")
+                coordinates_by_zip[zip_code] = None
+        coordinates = coordinates_by_zip[zip_code]
+        if not coordinates:
+            print(f"Could not get coordinates for zip_code {zip_code}, leaving it queued")
+            continue
+
+        rows.append({**row, "latitude": coordinates[0], "longitude": coordinates[1]})
+        batch_keys.append(key)
+        if len(rows) >= COMPACT_BATCH_SIZE:
+            _merge_pending_batch(bucket_name, rows, batch_keys)
+            merged += len(rows)
+            rows, batch_keys = [], []
+
+    if rows:
+        _merge_pending_batch(bucket_name, rows, batch_keys)
+        merged += len(rows)
+
+    print(f"Compacted {merged} of {len(keys)} queued subscriber locations")
+    return merged
+
+def _match_group(table, rows, fire_lat, fire_lon, radius_miles):
+    """Rows of one threshold group with a fire inside their radius bounding box, as one batched pass."""
+
+    # Coarse pass: keep subscribers with a fire in a cell within reach of their own
+    radius_degrees = np.float32(radius_miles / MILES_PER_DEGREE)
+    reach = int(np.ceil(radius_degrees / CELL_DEGREES))
+    fire_cells = np.unique(grid_cells(fire_lat, fire_lon))
+    offsets = np.array([dr * CELL_COLUMNS + dc for dr in range(-reach, reach + 1) for dc in range(-reach, reach + 1)],
+                       dtype=np.int32)
+    neighbours = np.asarray(table.cell)[rows][:, None] + offsets[None, :]
+    candidates = rows[np.isin(neighbours, fire_cells).any(axis=1)]
+
+    # Exact pass: bounding-box test of candidate subscribers against all fires, in chunks
+    matched = [np.empty(0, dtype=rows.dtype)]
+    for start in range(0, len(candidates), MATCH_CHUNK_SIZE):
+        chunk = candidates[start:start + MATCH_CHUNK_SIZE]
+        lat = np.asarray(table.lat)[chunk][:, None]
+        lon = np.asarray(table.lon)[chunk][:, None]
+        in_box = (np.abs(fire_lat[None, :] - lat) <= radius_degrees) & (np.abs(fire_lon[None, :] - lon) <= radius_degrees)
+        matched.append(chunk[in_box.any(axis=1)])
+    return np.concatenate(matched)
+
+def match_topics(table, fire_data, radius_miles=None, frp_threshold=None):
+    """Return the set of topic ARNs with at least one qualifying fire inside their radius bounding box.
+
+    Each topic is matched with its own thresholds unless radius_miles / frp_threshold override
+    them. Topics are grouped by threshold pair and every group is matched in one batched pass.
+    """
+    if len(table) == 0 or fire_data.empty:
+        return set()
+
+    radius = np.full(len(table), radius_miles, dtype=np.float32) if radius_miles is not None else np.asarray(table.radius)
+    frp = np.full(len(table), frp_threshold, dtype=np.float32) if frp_threshold is not None else np.asarray(table.frp)
+    fire_frp = fire_data['frp'].to_numpy(dtype=np.float32)
+    all_fire_lat = fire_data['latitude'].to_numpy(dtype=np.float32)
+    all_fire_lon = fire_data['longitude'].to_numpy(dtype=np.float32)
+
+    groups, group_of_row = np.unique(np.stack([radius, frp], axis=1), axis=0, return_inverse=True)
+    group_of_row = group_of_row.reshape(-1)
+
+    matched = []
+    for group, (group_radius, group_frp) in enumerate(groups.tolist()):
+        qualifying = fire_frp >= group_frp
+        if not qualifying.any():
+            continue
+        rows = np.flatnonzero(group_of_row == group)
+        matched.append(_match_group(table, rows, all_fire_lat[qualifying], all_fire_lon[qualifying], group_radius))
+
+    if not matched:
+        return set()
+    topic_index = np.asarray(table.topic_index)
+    return {table.topics[index] for index in topic_index[np.concatenate(matched)].tolist()}
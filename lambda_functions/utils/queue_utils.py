@@ -0,0 +1,66 @@
+import os
+import json
+import uuid
+from collections import deque
+import boto3
+
+# SQS queue for async onboarding, required unless requests go to the in-process stand-in
+ONBOARDING_QUEUE_URL = os.environ.get('ONBOARDING_QUEUE_URL')
+
+def get_sqs_client():
+    return boto3.client("sqs")
+
+class LocalQueue:
+    """In-process stand-in for the onboarding SQS queue, producing SQS-shaped records.
+
+    Nothing drains it in a deployed Lambda; onboarding_worker_function.local_runner drains it into the worker.
+    """
+
+    def __init__(self):
+        self._messages = deque()
+
+    def send_message(self, body):
+        message_id = str(uuid.uuid4())
+        self._messages.append({"messageId": message_id, "body": body})
+        return message_id
+
+    def drain(self, max_messages=10):
+        """Remove and return up to max_messages records, as an SQS event would deliver them."""
+        records = []
+        while self._messages and len(records) < max_messages:
+            records.append(self._messages.popleft())
+        return records
+
+    def __len__(self):
+        return len(self._messages)
+
+local_queue = LocalQueue()
+
+def enqueue_onboarding_request(email, zip_code, alert_radius_miles=None, frp_threshold=None, local=False):
+    """Queue a validated sign-up for the onboarding worker and return the message ID.
+
+    With local=True the request goes to the in-process local_queue instead of SQS.
+    """
+    request = {"email": email, "zip_code": zip_code}
+    if alert_radius_miles is not None:
+        request["alert_radius_miles"] = alert_radius_miles
+    if frp_threshold is not None:
+        request["frp_threshold"] = frp_threshold
+    body = json.dumps(request)
+
+    if local:
+        message_id = local_queue.send_message(body)
+        print(f"Queued onboarding request locally for {email}")
+        return message_id
+
+    if not ONBOARDING_QUEUE_URL:
+        raise RuntimeError("ONBOARDING_QUEUE_URL is not set, cannot queue onboarding request")
+
+    sqs = get_sqs_client()
+    try:
+        response = sqs.send_message(QueueUrl=ONBOARDING_QUEUE_URL, MessageBody=body)
+        print(f"Queued onboarding request for {email}")
+        return response["MessageId"]
+    except Exception as e:
+        print(f"Failed to queue onboarding request for {email}: {str(e)}")
+        raise
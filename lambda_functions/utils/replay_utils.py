@@ -0,0 +1,154 @@
+"""Replay archived FIRMS data through the matching and clustering pipeline, day by day.
+
+Nothing is published to SNS or written to S3: each day's alerts are rendered and counted only,
+so threshold changes can be evaluated against past fire seasons. No network access is needed,
+though AWS_DEFAULT_REGION must be set for the boto3 clients the shared utils create, e.g.:
+
+    python -m lambda_functions.utils.replay_utils --archive firms_2023/ \
+        --start 2023-07-01 --end 2023-09-30 --subscribers subscribers.json --frp 30
+
+Subscribers are matched with their own thresholds unless --radius or --frp overrides them all.
+"""
+import os
+import json
+import glob
+import time
+import argparse
+from multiprocessing import Pool
+import pandas as pd
+from lambda_functions.utils.wildfire_utils import filter_nearby_fires
+from lambda_functions.utils.sns_utils import build_clustered_alert
+from lambda_functions.utils.cluster_utils import cluster_fires
+from lambda_functions.utils.location_table_utils import (
+    build_location_table,
+    parse_location_table,
+    open_location_table,
+    match_topics
+)
+
+# Subscriber table shared by the worker processes, set once per process by the pool initializer
+_replay_table = None
+
+def read_archive_file(path):
+    """Read one archived FIRMS file; Parquet files need pyarrow or fastparquet installed."""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+def load_archive(path, start_date, end_date):
+    """Load FIRMS detections from a CSV/Parquet file or directory, limited to [start_date, end_date]."""
+    if os.path.isdir(path):
+        paths = sorted(glob.glob(os.path.join(path, '*.csv')) + glob.glob(os.path.join(path, '*.parquet')))
+    else:
+        paths = [path]
+    if not paths:
+        raise ValueError(f"No FIRMS archive files found in {path}")
+
+    data = pd.concat([read_archive_file(p) for p in paths], ignore_index=True)
+    if 'frp' not in data.columns or 'latitude' not in data.columns or 'longitude' not in data.columns \
+            or 'acq_date' not in data.columns:
+        raise ValueError("Missing required columns in FIRMS archive.")
+
+    data['frp'] = pd.to_numeric(data['frp'], errors='coerce')
+    data = data.dropna(subset=['frp'])
+    data['acq_date'] = pd.to_datetime(data['acq_date']).dt.strftime('%Y-%m-%d')
+    return data[(data['acq_date'] >= start_date) & (data['acq_date'] <= end_date)]
+
+def load_subscribers(path):
+    """Load subscriber locations from a location table artifact or a JSON list of rows."""
+    if path.endswith('.json'):
+        with open(path) as f:
+            rows = json.load(f)
+        return parse_location_table(build_location_table([
+            {
+                "topic_arn": row.get("topic_arn") or row["sns_topic_arn"],
+                "zip_code": row["zip_code"],
+                "latitude": row["latitude"],
+                "longitude": row["longitude"],
+                "alert_radius_miles": row.get("alert_radius_miles"),
+                "frp_threshold": row.get("frp_threshold")
+            }
+            for row in rows
+        ]))
+    return open_location_table(path)
+
+def _init_worker(table):
+    global _replay_table
+    _replay_table = table
+
+def replay_day(task):
+    """Run matching, clustering and alert rendering for one day of detections.
+
+    Thresholds left as None fall back to each topic's own from the subscriber table.
+    """
+    day, fires, radius_miles, frp_threshold = task
+    table = _replay_table
+    started = time.perf_counter()
+
+    fires = cluster_fires(fires)
+    alerts = {}
+    for topic_arn in match_topics(table, fires, radius_miles, frp_threshold):
+        lat, lon = table.coordinates_for(topic_arn)
+        topic_radius, topic_frp = table.thresholds_for(topic_arn)
+        nearby_fires = filter_nearby_fires(
+            fires, lat, lon,
+            topic_radius if radius_miles is None else radius_miles,
+            topic_frp if frp_threshold is None else frp_threshold
+        )
+        if nearby_fires.empty:
+            continue
+        message = build_clustered_alert(nearby_fires, lat, lon)
+        alerts[topic_arn] = {"fires": len(nearby_fires), "message_bytes": len(message.encode('utf-8'))}
+
+    return {"day": day, "detections": len(fires), "alerts": alerts, "seconds": time.perf_counter() - started}
+
+def run_replay(data, table, radius_miles=None, frp_threshold=None, processes=None):
+    """Replay each day of the archive across a process pool and aggregate alert counts per topic."""
+    tasks = [(day, fires, radius_miles, frp_threshold) for day, fires in data.groupby('acq_date', sort=True)]
+
+    started = time.perf_counter()
+    if processes == 1:
+        _init_worker(table)
+        results = [replay_day(task) for task in tasks]
+    else:
+        with Pool(processes, initializer=_init_worker, initargs=(table,)) as pool:
+            results = pool.map(replay_day, tasks)
+    elapsed = time.perf_counter() - started
+
+    topics = {}
+    for result in results:
+        for topic_arn, alert in result["alerts"].items():
+            summary = topics.setdefault(topic_arn, {"alert_days": 0, "fires": 0, "max_message_bytes": 0})
+            summary["alert_days"] += 1
+            summary["fires"] += alert["fires"]
+            summary["max_message_bytes"] = max(summary["max_message_bytes"], alert["message_bytes"])
+
+    detections = sum(result["detections"] for result in results)
+    return {
+        "days": len(results),
+        "detections": detections,
+        "alerts": sum(len(result["alerts"]) for result in results),
+        "topics": topics,
+        "elapsed_seconds": elapsed,
+        "detections_per_second": detections / elapsed if elapsed else 0.0,
+        "days_per_second": len(results) / elapsed if elapsed else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay archived FIRMS data without sending alerts.")
+    parser.add_argument("--archive", required=True, help="FIRMS CSV/Parquet file or directory")
+    parser.add_argument("--start", required=True, help="First day to replay (YYYY-MM-DD)")
+    parser.add_argument("--end", required=True, help="Last day to replay (YYYY-MM-DD)")
+    parser.add_argument("--subscribers", required=True, help="Location table artifact or JSON list of subscribers")
+    parser.add_argument("--radius", type=float, default=None, help="Alert radius in miles for every subscriber")
+    parser.add_argument("--frp", type=float, default=None, help="Minimum FRP in MW for every subscriber")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (defaults to CPU count)")
+    args = parser.parse_args()
+
+    data = load_archive(args.archive, args.start, args.end)
+    table = load_subscribers(args.subscribers)
+    report = run_replay(data, table, args.radius, args.frp, args.processes)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
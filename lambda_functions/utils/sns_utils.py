@@ -1,18 +1,40 @@
 import boto3
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from lambda_functions.utils.alert_utils import build_alert_message
+
+SUBSCRIBE_WORKERS = 8  # Concurrent SNS subscribe calls per onboarding batch
 
 def get_sns_client():
     return boto3.client("sns")
 
-def get_or_create_sns_topic(zip_code):
-    """Find existing SNS topic for zip code or create a new one."""
-    sns = get_sns_client()
+def _format_threshold(value):
+    # Exact fixed-point digits: no exponent, which SNS names reject, and no lost precision
+    digits = format(Decimal(repr(float(value))).normalize(), 'f')
+    return digits.replace(".", "_")
+
+def get_topic_name(zip_code, alert_radius_miles=None, frp_threshold=None):
+    """SNS topic name for a zip code; custom thresholds get their own topic so alerts honor them.
+
+    Thresholds should already be normalized with normalize_threshold, so the name matches what is stored.
+    """
     topic_name = f"wildfire-alerts-{zip_code}"
+    if alert_radius_miles is not None:
+        topic_name += f"-r{_format_threshold(alert_radius_miles)}"
+    if frp_threshold is not None:
+        topic_name += f"-f{_format_threshold(frp_threshold)}"
+    return topic_name
+
+def get_or_create_sns_topic(zip_code, alert_radius_miles=None, frp_threshold=None):
+    """Find existing SNS topic for zip code and thresholds or create a new one."""
+    sns = get_sns_client()
+    topic_name = get_topic_name(zip_code, alert_radius_miles, frp_threshold)
 
     try:
         paginator = sns.get_paginator("list_topics")
         for page in paginator.paginate():
             for topic in page.get("Topics", []):
-                if topic_name in topic["TopicArn"]:
+                if topic["TopicArn"].split(":")[-1] == topic_name:
                     print(f"Found existing SNS topic: {topic['TopicArn']}")
                     return topic["TopicArn"]
 
@@ -24,9 +46,38 @@ def get_or_create_sns_topic(zip_code):
         print(f"Failed to get or create SNS topic: {str(e)}")
         raise
 
-def subscribe_user_to_topic(email, topic_arn):
-    """Subscribe user's email to the SNS topic."""
+def get_or_create_sns_topics(topic_keys):
+    """Resolve topics for many (zip_code, alert_radius_miles, frp_threshold) keys with one topic listing.
+
+    Only the missing topics are created. Returns a dict mapping each key to its topic ARN.
+    """
     sns = get_sns_client()
+    wanted = {get_topic_name(*key): key for key in set(topic_keys)}
+    topics = {}
+
+    try:
+        paginator = sns.get_paginator("list_topics")
+        for page in paginator.paginate():
+            for topic in page.get("Topics", []):
+                topic_name = topic["TopicArn"].split(":")[-1]
+                if topic_name in wanted:
+                    topics[wanted[topic_name]] = topic["TopicArn"]
+
+        for topic_name, key in wanted.items():
+            if key not in topics:
+                response = sns.create_topic(Name=topic_name)
+                print(f"Created new SNS topic: {response['TopicArn']}")
+                topics[key] = response["TopicArn"]
+
+        return topics
+
+    except Exception as e:
+        print(f"Failed to get or create SNS topics: {str(e)}")
+        raise
+
+def subscribe_user_to_topic(email, topic_arn, sns=None):
+    """Subscribe user's email to the SNS topic, using the given client if one is passed."""
+    sns = sns or get_sns_client()
 
     try:
         response = sns.subscribe(
@@ -40,42 +91,79 @@ def subscribe_user_to_topic(email, topic_arn):
         print(f"Failed to subscribe user: {str(e)}")
         raise
 
-def send_clustered_alert(fires, email, topic_arn):
-    """Send alert message summarizing grouped wildfires."""
+def subscribe_users_to_topics(subscriptions, max_workers=SUBSCRIBE_WORKERS):
+    """Subscribe (email, topic_arn) pairs concurrently. Returns the pairs that failed."""
+    if not subscriptions:
+        return []
+
+    # Creating clients from the default session is not thread-safe, but a client is, so share one
+    sns = get_sns_client()
+
+    def subscribe(pair):
+        try:
+            subscribe_user_to_topic(*pair, sns=sns)
+            return None
+        except Exception:
+            return pair
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(subscribe, subscriptions))
+    return [pair for pair in results if pair is not None]
+
+def unsubscribe_user_from_topic(email, topic_arn, sns=None):
+    """Remove a user's email subscription from the SNS topic. Returns True if one was removed.
+
+    Subscriptions still pending confirmation cannot be removed; SNS expires them after three days.
+    """
+    sns = sns or get_sns_client()
+
+    try:
+        paginator = sns.get_paginator("list_subscriptions_by_topic")
+        for page in paginator.paginate(TopicArn=topic_arn):
+            for subscription in page.get("Subscriptions", []):
+                if subscription.get("Protocol") == "email" and subscription.get("Endpoint") == email \
+                        and subscription["SubscriptionArn"].startswith("arn:"):
+                    sns.unsubscribe(SubscriptionArn=subscription["SubscriptionArn"])
+                    print(f"Unsubscribed {email} from SNS topic")
+                    return True
+        return False
+    except Exception as e:
+        print(f"Failed to unsubscribe user: {str(e)}")
+        raise
+
+def unsubscribe_users_from_topics(subscriptions, max_workers=SUBSCRIBE_WORKERS):
+    """Unsubscribe (email, topic_arn) pairs concurrently. Returns the pairs that failed."""
+    if not subscriptions:
+        return []
+
+    sns = get_sns_client()
+
+    def unsubscribe(pair):
+        try:
+            unsubscribe_user_from_topic(*pair, sns=sns)
+            return None
+        except Exception:
+            return pair
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(unsubscribe, subscriptions))
+    return [pair for pair in results if pair is not None]
+
+def build_clustered_alert(fires, lat=None, lon=None):
+    """Render the alert message summarizing grouped wildfires, most severe clusters first."""
+    return build_alert_message(fires, lat, lon)
+
+def send_clustered_alert(fires, email, topic_arn, message=None):
+    """Send alert message summarizing grouped wildfires, reusing a prebuilt message if given."""
     if fires.empty:
         return
 
-    clusters = {}
-    GRID_SIZE = 0.0725
-
-    for _, fire in fires.iterrows():
-        lat, lon = fire["latitude"], fire["longitude"]
-        grid_lat = round(lat / GRID_SIZE) * GRID_SIZE
-        grid_lon = round(lon / GRID_SIZE) * GRID_SIZE
-        key = f"{grid_lat},{grid_lon}"
-
-        if key not in clusters:
-            clusters[key] = {"center": (grid_lat, grid_lon), "fires": []}
-        clusters[key]["fires"].append(fire)
-
-    alert_messages = []
-    for cluster in clusters.values():
-        fire = cluster["fires"][0]
-        alert = (
-            f"🔥 Wildfire Alert!\n"
-            f"Location: {cluster['center'][0]:.4f}, {cluster['center'][1]:.4f}\n"
-            f"Fires in cluster: {len(cluster['fires'])}\n"
-            f"FRP: {fire['frp']} MW\n"
-            f"Date: {fire['acq_date']}"
-        )
-        alert_messages.append(alert)
-
-    final_message = "\n\n".join(alert_messages)
+    final_message = message or build_clustered_alert(fires)
 
     sns = get_sns_client()
     try:
         sns.publish(TopicArn=topic_arn, Message=final_message, Subject="🔥 Wildfire Alert")
-        print(f"Sent alert to {email} with {len(clusters)} clusters.")
+        print(f"Sent alert to {email or topic_arn} with {len(fires)} fires.")
     except Exception as e:
         print(f"Failed to send alert: {str(e)}")
         raise
@@ -0,0 +1,139 @@
+import json
+import time
+import boto3
+import botocore.exceptions
+import pandas as pd
+from lambda_functions.utils.wildfire_utils import fetch_fire_data, filter_nearby_fires
+from lambda_functions.utils.sns_utils import send_clustered_alert, build_clustered_alert
+from lambda_functions.utils.cluster_utils import cluster_fires
+from lambda_functions.utils.location_table_utils import match_topics
+
+s3 = boto3.client('s3')
+
+# Columns that identify a single FIRMS detection across polls
+DETECTION_KEY_COLUMNS = ['latitude', 'longitude', 'acq_date', 'acq_time', 'satellite']
+SNAPSHOT_KEY = 'stream/firms_snapshot.json'
+POLL_INTERVAL_SECONDS = 300  # Poll FIRMS every 5 minutes
+
+def detection_keys(data):
+    """Build a string key per detection from the identifying columns present in the data."""
+    columns = [column for column in DETECTION_KEY_COLUMNS if column in data.columns]
+    keys = data[columns[0]].astype(str)
+    for column in columns[1:]:
+        keys = keys + "|" + data[column].astype(str)
+    return keys
+
+def diff_new_detections(data, previous_keys):
+    """Split out detections not present in the previous snapshot and return them with the current keys."""
+    keys = detection_keys(data)
+    new_fires = data[~keys.isin(previous_keys).values]
+    return new_fires, set(keys)
+
+def load_snapshot(bucket_name):
+    """Load the previous poll's snapshot from S3, or None if no snapshot exists yet.
+
+    A snapshot holds the detection keys seen so far and, per topic whose alert failed, the keys
+    of the fires to send it again.
+    """
+    try:
+        response = s3.get_object(Bucket=bucket_name, Key=SNAPSHOT_KEY)
+        snapshot = json.loads(response["Body"].read())
+    except botocore.exceptions.ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "NoSuchKey":
+            print(f"Failed to load FIRMS snapshot: {e}")
+            raise
+        print("No previous FIRMS snapshot found in S3.")
+        return None
+
+    return {"keys": set(snapshot["keys"]), "pending": snapshot["pending"]}
+
+def save_snapshot(bucket_name, snapshot):
+    """Persist the current poll's snapshot to S3."""
+    try:
+        s3.put_object(Bucket=bucket_name, Key=SNAPSHOT_KEY, Body=json.dumps({
+            "keys": sorted(snapshot["keys"]),
+            "pending": snapshot["pending"]
+        }))
+    except Exception as e:
+        print(f"Failed to save FIRMS snapshot: {str(e)}")
+        raise
+
+def alert_new_fires(new_fires, table, send_alert=send_clustered_alert, retries=None):
+    """Alert the topics with new fires inside their radius, matched through the subscriber location table.
+
+    retries maps topics whose previous alert failed to the fires to send them again. Returns the
+    number of topics alerted and, for each topic that failed now, the keys of its fires.
+    """
+    retries = retries or {}
+    topics = (match_topics(table, new_fires) if not new_fires.empty else set()) | set(retries)
+
+    alerted = 0
+    failed = {}
+    for topic_arn in topics:
+        coordinates = table.coordinates_for(topic_arn)
+        if coordinates is None:
+            continue
+
+        fires = pd.concat([retries[topic_arn], new_fires]) if topic_arn in retries else new_fires
+        alert_radius_miles, frp_threshold = table.thresholds_for(topic_arn)
+        nearby_fires = filter_nearby_fires(fires, coordinates[0], coordinates[1], alert_radius_miles, frp_threshold)
+        if nearby_fires.empty:
+            continue
+
+        zip_code = table.zip_code_for(topic_arn)
+        try:
+            # Rendered like the daily alert, ranked by distance from the topic's location; a topic has
+            # no single subscriber email, so none is passed
+            send_alert(nearby_fires, None, topic_arn, message=build_clustered_alert(nearby_fires, *coordinates))
+            alerted += 1
+        except Exception as e:
+            print(f"Failed to send alert for zip_code {zip_code}: {str(e)}")
+            failed[topic_arn] = sorted(set(detection_keys(nearby_fires)))
+    return alerted, failed
+
+def poll_once(previous, table, fetch=fetch_fire_data, send_alert=send_clustered_alert):
+    """Run a single poll: fetch detections, diff against the previous snapshot and alert on new fires.
+
+    Returns the current snapshot and the number of topics alerted. When there is no previous
+    snapshot the current detections only seed it, so a cold start does not re-alert fires the
+    daily run already covered. Work per poll follows the new fires, not the subscriber count.
+    """
+    data = fetch()
+    if data is None:
+        return previous, 0
+
+    if previous is None:
+        print(f"Seeded FIRMS snapshot with {len(data)} detections.")
+        return {"keys": set(detection_keys(data)), "pending": {}}, 0
+
+    # Cluster the full snapshot so new fires carry the ID of the cluster they joined
+    data = cluster_fires(data)
+    new_fires, keys = diff_new_detections(data, previous["keys"])
+    print(f"🔥 {len(new_fires)} new detections since the previous poll")
+
+    # Fires whose alert failed last poll are sent again while FIRMS still reports them
+    retries = {}
+    if previous["pending"]:
+        data_keys = detection_keys(data)
+        for topic_arn, pending_keys in previous["pending"].items():
+            fires = data[data_keys.isin(pending_keys).values]
+            if not fires.empty:
+                retries[topic_arn] = fires
+
+    if table is None or (new_fires.empty and not retries):
+        return {"keys": keys, "pending": previous["pending"] if table is None else {}}, 0
+
+    alerted, failed = alert_new_fires(new_fires, table, send_alert, retries)
+    return {"keys": keys, "pending": failed}, alerted
+
+def run_stream(table, fetch=fetch_fire_data, send_alert=send_clustered_alert,
+               interval_seconds=POLL_INTERVAL_SECONDS, max_ticks=None, previous=None):
+    """Poll in a loop, alerting on new detections each tick. Stops after max_ticks if given."""
+    tick = 0
+    while max_ticks is None or tick < max_ticks:
+        previous, alerted = poll_once(previous, table, fetch, send_alert)
+        print(f"Tick {tick + 1}: alerted {alerted} topics")
+        tick += 1
+        if max_ticks is None or tick < max_ticks:
+            time.sleep(interval_seconds)
+    return previous
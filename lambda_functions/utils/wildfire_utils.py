@@ -4,7 +4,8 @@ import pandas as pd
 from io import StringIO
 import boto3
 from lambda_functions.utils.ssm_utils import get_nasa_api_key
-from lambda_functions.utils.sns_utils import send_clustered_alert
+from lambda_functions.utils.sns_utils import build_clustered_alert, send_clustered_alert
+from lambda_functions.utils.cache_utils import LRUCache, make_match_key
 
 s3 = boto3.client('s3')
 
@@ -12,93 +13,155 @@ s3 = boto3.client('s3')
 FRP_THRESHOLD = 50  # Only fires with FRP ≥ 50 will be included
 MILES_PER_DEGREE = 69.0  # Approximate miles per degree of latitude
 ALERT_RADIUS_MILES = 100  # Search within 100 miles
+LOCATION_PRECISION = 2  # Subscriber coordinates are rounded to ~0.7 miles for match caching
+MATCH_CACHE_SIZE = 1024  # Number of (snapshot, location, radius, FRP) matches kept in memory
+FIRMS_URL = 'https://firms.modaps.eosdis.nasa.gov/api/country/csv/{api_key}/MODIS_NRT/USA/1'
 
-def process_fires(lat, lon, email, zip_code, topic_arn, bucket_name):
-    """Fetch and process wildfire data for a location, filtering based on FRP and 100-mile radius."""
+def fetch_fire_data():
+    """Fetch the latest FIRMS detections for the USA as a DataFrame with numeric FRP."""
+
+    api_key = get_nasa_api_key()
+    url = FIRMS_URL.format(api_key=api_key)
+
+    try:
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Error fetching wildfire data from NASA: {str(e)}")
+        return None
+
+    if not response.text.strip():
+        print("NASA API returned an empty response.")
+        return None
+
+    try:
+        data = pd.read_csv(StringIO(response.text))
+    except Exception as e:
+        print(f"Error parsing wildfire CSV data: {str(e)}")
+        return None
+
+    if 'frp' not in data.columns or 'latitude' not in data.columns or 'longitude' not in data.columns:
+        print("Missing required columns in NASA data.")
+        return None
+
+    data['frp'] = pd.to_numeric(data['frp'], errors='coerce')
+    return data.dropna(subset=['frp'])
+
+def subscription_thresholds(subscription):
+    """Return (alert_radius_miles, frp_threshold) for a subscription, defaulting unset values."""
+    radius = subscription.get('alert_radius_miles')
+    frp = subscription.get('frp_threshold')
+    return (
+        float(radius) if radius is not None else ALERT_RADIUS_MILES,
+        float(frp) if frp is not None else FRP_THRESHOLD
+    )
+
+# Nearby fires and rendered alert message per match key, shared across subscribers and runs
+match_cache = LRUCache(MATCH_CACHE_SIZE)
+
+def get_snapshot_version(data):
+    """Content hash identifying a FIRMS snapshot, so cached matches are never reused across data."""
+    return format(int(pd.util.hash_pandas_object(data, index=False).sum()), "016x")
+
+def match_nearby_fires(data, snapshot_version, lat, lon, radius_miles=ALERT_RADIUS_MILES, frp_threshold=FRP_THRESHOLD):
+    """Return (nearby_fires, alert_message) for a location, memoized per snapshot and rounded location."""
+
+    key = make_match_key(snapshot_version, lat, lon, radius_miles, frp_threshold, LOCATION_PRECISION)
+    cached = match_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Filter on the rounded location so every subscriber sharing the key gets the same match
+    nearby_fires = filter_nearby_fires(data, key[1], key[2], radius_miles, frp_threshold)
+    result = (nearby_fires, build_clustered_alert(nearby_fires, key[1], key[2]))
+    match_cache.put(key, result)
+    return result
+
+def filter_nearby_fires(data, lat, lon, radius_miles=ALERT_RADIUS_MILES, frp_threshold=FRP_THRESHOLD):
+    """Return the fires with FRP ≥ threshold inside the radius bounding box around (lat, lon)."""
+
+    # Apply FRP filter
+    data = data[data['frp'] >= frp_threshold]
+
+    # Calculate bounding box for the search radius
+    radius_degrees = radius_miles / MILES_PER_DEGREE
+    lat_min = lat - radius_degrees
+    lat_max = lat + radius_degrees
+    lon_min = lon - radius_degrees
+    lon_max = lon + radius_degrees
+
+    # Filter fires by latitude & longitude
+    return data[
+        (data['latitude'] >= lat_min) & (data['latitude'] <= lat_max) &
+        (data['longitude'] >= lon_min) & (data['longitude'] <= lon_max)
+    ].copy()
+
+def process_fires(lat, lon, email, zip_code, topic_arn, bucket_name, data=None, snapshot_version=None,
+                  alert_radius_miles=ALERT_RADIUS_MILES, frp_threshold=FRP_THRESHOLD, publish=True):
+    """Fetch and process wildfire data for a location, filtering based on FRP and alert radius.
+
+    Pass a snapshot already fetched with fetch_fire_data (and its version) to avoid refetching it.
+    With publish=False the subscriber's fire data is saved to S3 but no alert is sent, for topics
+    already alerted this run. Returns True if everything succeeded, False otherwise.
+    """
 
     # Input validation
     if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
         print(f"Invalid latitude/longitude: lat={lat}, lon={lon}")
-        return
+        return False
 
     if not email or "@" not in email:
         print(f"Invalid email: {email}")
-        return
+        return False
 
     if not zip_code or not zip_code.strip().isdigit():
         print(f"Invalid zip code: {zip_code}")
-        return
+        return False
 
     if not topic_arn or not topic_arn.startswith("arn:aws:sns"):
         print(f"Invalid SNS topic ARN: {topic_arn}")
-        return
+        return False
 
     if not bucket_name:
         print("Bucket name is missing.")
-        return
+        return False
 
     try:
-        api_key = get_nasa_api_key()
-        url = f'https://firms.modaps.eosdis.nasa.gov/api/country/csv/{api_key}/MODIS_NRT/USA/1'
+        if data is None:
+            data = fetch_fire_data()
+            if data is None:
+                return False
+
+        if snapshot_version is None:
+            snapshot_version = get_snapshot_version(data)
+
+        nearby_fires, message = match_nearby_fires(data, snapshot_version, lat, lon, alert_radius_miles, frp_threshold)
+
+        print(f"🔥 {len(nearby_fires)} fires found near {zip_code} (within {alert_radius_miles:g} miles, FRP ≥ {frp_threshold:g})")
+
+        if nearby_fires.empty:
+            print("No fires met the filtering criteria. No alerts sent.")
+            return True
+
+        file_name = f'wildfire_data_{zip_code}.csv'
+        s3_key = f"{email}/{zip_code}/{file_name}"
 
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-        except requests.RequestException as e:
-            print(f"Error fetching wildfire data from NASA: {str(e)}")
-            return
+            s3.put_object(Bucket=bucket_name, Key=s3_key, Body=nearby_fires.to_csv(index=False))
+        except Exception as e:
+            print(f"Failed to upload file to S3: {str(e)}")
+            return False
 
-        if not response.text.strip():
-            print("NASA API returned an empty response.")
-            return
+        if not publish:
+            return True
 
         try:
-            data = pd.read_csv(StringIO(response.text))
+            send_clustered_alert(nearby_fires, email, topic_arn, message=message)
         except Exception as e:
-            print(f"Error parsing wildfire CSV data: {str(e)}")
-            return
-
-        if 'frp' not in data.columns or 'latitude' not in data.columns or 'longitude' not in data.columns:
-            print("Missing required columns in NASA data.")
-            return
-
-        data['frp'] = pd.to_numeric(data['frp'], errors='coerce')
-        data = data.dropna(subset=['frp'])
-
-        # Apply FRP filter
-        data = data[data['frp'] >= FRP_THRESHOLD].copy()
-
-        # Calculate bounding box for 100-mile search radius
-        miles_to_degrees = 1.0 / MILES_PER_DEGREE
-        lat_min = lat - (ALERT_RADIUS_MILES * miles_to_degrees)
-        lat_max = lat + (ALERT_RADIUS_MILES * miles_to_degrees)
-        lon_min = lon - (ALERT_RADIUS_MILES * miles_to_degrees)
-        lon_max = lon + (ALERT_RADIUS_MILES * miles_to_degrees)
-
-        # Filter fires by latitude & longitude
-        nearby_fires = data[
-            (data['latitude'] >= lat_min) & (data['latitude'] <= lat_max) &
-            (data['longitude'] >= lon_min) & (data['longitude'] <= lon_max)
-        ]
-
-        print(f"🔥 {len(nearby_fires)} fires found near {zip_code} (within 100 miles, FRP ≥ {FRP_THRESHOLD})")
-
-        if not nearby_fires.empty:
-            file_name = f'wildfire_data_{zip_code}.csv'
-            s3_key = f"{email}/{zip_code}/{file_name}"
-
-            try:
-                s3.put_object(Bucket=bucket_name, Key=s3_key, Body=nearby_fires.to_csv(index=False))
-            except Exception as e:
-                print(f"Failed to upload file to S3: {str(e)}")
-                return
-
-            try:
-                send_clustered_alert(nearby_fires, email, topic_arn)
-            except Exception as e:
-                print(f"Failed to send alert: {str(e)}")
-        else:
-            print("No fires met the filtering criteria. No alerts sent.")
+            print(f"Failed to send alert: {str(e)}")
+            return False
+        return True
 
     except Exception as e:
         print(f"Unexpected error in process_fires for {email}: {str(e)}")
+        return False
@@ -0,0 +1,69 @@
+import sys
+import os
+import pandas as pd
+
+# Add root directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lambda_functions.utils.alert_utils import build_alert_message, cluster_render_cache
+
+def make_fires(rows):
+    return pd.DataFrame(rows, columns=["latitude", "longitude", "frp", "acq_date", "acq_time"])
+
+class TestBuildAlertMessage:
+    def test_ranks_clusters_by_aggregate_frp(self):
+        # A weak single fire and a cluster of three strong fires further away
+        fires = make_fires([
+            [34.05, -118.25, 55.0, "2024-05-01", 1200],
+            [34.60, -118.80, 90.0, "2024-05-01", 1200],
+            [34.61, -118.81, 95.0, "2024-05-01", 1200],
+            [34.60, -118.81, 85.0, "2024-05-01", 1200]
+        ])
+
+        message = build_alert_message(fires, 34.05, -118.25)
+
+        # The larger cluster is listed first despite being further from the subscriber
+        assert message.startswith("🔥 Wildfire Alert!")
+        assert message.index("Total FRP: 270.0 MW") < message.index("Total FRP: 55.0 MW")
+        assert "Distance:" in message
+
+    def test_summarizes_clusters_beyond_the_limit(self):
+        # Twelve separate clusters, one per grid cell
+        fires = make_fires([[34.0 + i, -118.0, 50.0 + i, "2024-05-01", 1200] for i in range(12)])
+
+        message = build_alert_message(fires, max_clusters=10)
+
+        # Ten clusters are rendered in full and the two weakest are summarized
+        assert message.count("Fires in cluster:") == 10
+        assert "...and 2 more clusters (2 fires, total FRP 101.0 MW)." in message
+        assert "Total FRP: 50.0 MW" not in message
+
+    def test_stays_within_size_limit(self):
+        fires = make_fires([[30.0 + i * 0.5, -118.0, 60.0, "2024-05-01", 1200] for i in range(20)])
+
+        message = build_alert_message(fires, max_clusters=20, max_bytes=1024)
+
+        assert len(message.encode("utf-8")) <= 1024
+        assert "more clusters" in message
+
+    def test_reuses_rendered_cluster_bodies(self):
+        cluster_render_cache.clear()
+        fires = make_fires([[34.05, -118.25, 60.0, "2024-05-01", 1200]])
+
+        # Rendering the same fires for two topics builds the cluster body only once
+        build_alert_message(fires, 34.0, -118.2)
+        build_alert_message(fires, 34.3, -118.6)
+
+        assert len(cluster_render_cache) == 1
+
+    def test_groups_by_snapshot_cluster_ids(self):
+        # Fires labelled by cluster_fires are grouped by ID rather than by grid cell
+        fires = make_fires([
+            [34.00, -118.00, 60.0, "2024-05-01", 1200],
+            [34.04, -118.00, 70.0, "2024-05-01", 1300]
+        ]).assign(cluster_id=["WF-0000abcd", "WF-0000abcd"])
+
+        message = build_alert_message(fires)
+
+        assert "Cluster: WF-0000abcd" in message
+        assert message.count("Fires in cluster: 2") == 1
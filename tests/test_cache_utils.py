@@ -0,0 +1,32 @@
+import sys
+import os
+
+# Add root directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lambda_functions.utils.cache_utils import LRUCache, make_match_key
+
+class TestLRUCache:
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+
+        # Reading "a" makes "b" the least recently used entry
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+
+        assert "b" not in cache
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+
+class TestMakeMatchKey:
+    def test_nearby_locations_share_a_key(self):
+        # Coordinates that round to the same location produce the same key
+        key_a = make_match_key("v1", 34.051, -118.249, 100, 50)
+        key_b = make_match_key("v1", 34.049, -118.251, 100, 50)
+        assert key_a == key_b
+
+        # A different snapshot version never shares a key
+        assert make_match_key("v2", 34.051, -118.249, 100, 50) != key_a
@@ -0,0 +1,61 @@
+import sys
+import os
+import pandas as pd
+
+# Add root directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lambda_functions.utils.cluster_utils import cluster_fires
+
+def make_fires(rows):
+    return pd.DataFrame(rows, columns=["latitude", "longitude", "frp", "acq_date", "acq_time"])
+
+class TestClusterFires:
+    def test_connects_chains_of_nearby_fires(self):
+        # A chain of fires ~2 miles apart across a grid-cell boundary, plus one isolated fire
+        fires = make_fires([
+            [34.000, -118.0, 60.0, "2024-05-01", 1200],
+            [34.030, -118.0, 70.0, "2024-05-01", 1100],
+            [34.060, -118.0, 80.0, "2024-05-01", 1300],
+            [35.000, -118.0, 90.0, "2024-05-01", 1200]
+        ])
+
+        clustered = cluster_fires(fires, eps_miles=3)
+
+        # The chain forms one cluster and the isolated fire its own
+        ids = clustered["cluster_id"].tolist()
+        assert ids[0] == ids[1] == ids[2]
+        assert ids[3] != ids[0]
+        assert len(clustered) == len(fires)
+
+    def test_cluster_id_is_stable_as_fires_join(self):
+        earlier = make_fires([
+            [34.000, -118.0, 60.0, "2024-05-01", 1100],
+            [34.030, -118.0, 70.0, "2024-05-01", 1200]
+        ])
+
+        # A later detection joins the existing cluster on the next poll
+        later = pd.concat([earlier, make_fires([[34.060, -118.0, 80.0, "2024-05-01", 1300]])], ignore_index=True)
+
+        first_id = cluster_fires(earlier, eps_miles=3)["cluster_id"].iloc[0]
+        assert set(cluster_fires(later, eps_miles=3)["cluster_id"]) == {first_id}
+
+    def test_handles_empty_snapshot(self):
+        clustered = cluster_fires(make_fires([]))
+        assert clustered.empty
+        assert "cluster_id" in clustered.columns
+
+    def test_alerts_show_snapshot_wide_cluster_figures(self):
+        from lambda_functions.utils.alert_utils import build_alert_message
+        from lambda_functions.utils.wildfire_utils import filter_nearby_fires
+
+        # One cluster of a weak and a strong fire
+        clustered = cluster_fires(make_fires([
+            [34.000, -118.0, 20.0, "2024-05-01", 1200],
+            [34.030, -118.0, 70.0, "2024-05-01", 1300]
+        ]), eps_miles=3)
+
+        # A subscriber's FRP filter drops the weak fire, but the cluster is described in full
+        message = build_alert_message(filter_nearby_fires(clustered, 34.0, -118.0, 100, 50))
+        assert "Fires in cluster: 2" in message
+        assert "Total FRP: 90.0 MW" in message
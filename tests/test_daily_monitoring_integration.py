@@ -1,45 +1,226 @@
 import sys
 import os
-from unittest.mock import patch
+import json
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+import pandas as pd
+import pytest
 
 # Add root directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-@patch.dict(os.environ, {"BUCKET_NAME": "fake-bucket", "DYNAMODB_TABLE_NAME": "fake-table"})
-@patch("lambda_functions.daily_monitoring_function.lambda_function.get_subscriptions")
-@patch("lambda_functions.daily_monitoring_function.lambda_function.get_coordinates")
-@patch("lambda_functions.daily_monitoring_function.lambda_function.process_fires")
-def test_daily_monitoring_lambda_handler_success(
-    mock_process_fires,
-    mock_get_coordinates,
-    mock_get_subscriptions
-):
-    from lambda_functions.daily_monitoring_function import lambda_function
-
-    # Mock a single user subscription record
-    mock_get_subscriptions.return_value = [{
+HANDLER_MODULE = "lambda_functions.daily_monitoring_function.lambda_function"
+EVENT = {"source": "aws.events", "time": "2024-05-01T06:00:00Z"}
+TOPIC_A = "arn:aws:sns:us-east-1:123456789012:topic-a"
+TOPIC_B = "arn:aws:sns:us-east-1:123456789012:topic-b"
+
+@pytest.fixture
+def daily():
+    """Patch everything the handler calls out to, around one fire near Los Angeles and no checkpoint yet.
+
+    Each mock is reachable by name (e.g. daily.process_fires) and the handler module as daily.lambda_function.
+    """
+    defaults = {
+        "fetch_fire_data": pd.DataFrame({
+            "latitude": [34.05], "longitude": [-118.25], "frp": [60.0], "acq_date": ["2024-05-01"]
+        }),
+        "process_fires": True,
+        "get_coordinates": (34.05, -118.25),
+        "scan_subscriptions_page": ([], None),
+        "load_checkpoint": None,
+        "save_checkpoint": None,
+        "load_location_table": None,
+        "upsert_subscriber_locations": None,
+        "compact_pending_locations": 0,
+        "continue_run": True
+    }
+
+    with ExitStack() as stack:
+        stack.enter_context(patch.dict(os.environ, {"BUCKET_NAME": "fake-bucket", "DYNAMODB_TABLE_NAME": "fake-table"}))
+        mocks = {
+            name: stack.enter_context(patch(f"{HANDLER_MODULE}.{name}", return_value=value))
+            for name, value in defaults.items()
+        }
+        from lambda_functions.daily_monitoring_function import lambda_function
+        yield SimpleNamespace(lambda_function=lambda_function, **mocks)
+
+def test_daily_monitoring_lambda_handler_success(daily):
+    # Mock a single page with a single user subscription record
+    daily.scan_subscriptions_page.return_value = ([{
         "email": "test@email.com",
         "zip_code": "12345",
         "sns_topic_arn": "arn:aws:sns:us-east-1:123456789012:test-topic"
-    }]
-
-    # Mock the coordinates returned for the provided zip code
-    mock_get_coordinates.return_value = (34.05, -118.25)
+    }], None)
 
     # Simulate an EventBridge scheduled event trigger
     event = {
         "source": "aws.events",
-        "detail-type": "Scheduled Event"
+        "detail-type": "Scheduled Event",
+        "time": "2024-05-01T06:00:00Z"
     }
 
     # Invoke the Lambda function
-    response = lambda_function.lambda_handler(event, {})
+    response = daily.lambda_function.lambda_handler(event, {})
 
     # Check that the response is successful and contains expected message
     assert response["statusCode"] == 200
     assert "Daily check completed" in response["body"]
 
     # Verify that internal helper functions were each called once
-    mock_get_subscriptions.assert_called_once()
-    mock_get_coordinates.assert_called_once_with("12345")
-    mock_process_fires.assert_called_once()
+    daily.scan_subscriptions_page.assert_called_once_with(None)
+    daily.get_coordinates.assert_called_once_with("12345")
+    daily.fetch_fire_data.assert_called_once()
+    daily.process_fires.assert_called_once()
+
+    # The run is marked completed so a retry does not re-alert anyone
+    daily.save_checkpoint.assert_called_once_with(
+        "fake-bucket", "daily-2024-05-01", None, {"arn:aws:sns:us-east-1:123456789012:test-topic"}, completed=True
+    )
+
+    # The geocoded location is added to the subscriber location table for the next run
+    daily.upsert_subscriber_locations.assert_called_once_with("fake-bucket", [{
+        "topic_arn": "arn:aws:sns:us-east-1:123456789012:test-topic",
+        "zip_code": "12345",
+        "latitude": 34.05,
+        "longitude": -118.25,
+        "alert_radius_miles": 100,
+        "frp_threshold": 50
+    }])
+
+def test_daily_monitoring_lambda_handler_resumes_from_checkpoint(daily):
+    # A previous invocation stopped on the second page after processing one topic
+    cursor = {"email": "a@email.com"}
+    daily.load_checkpoint.return_value = {
+        "run_id": "daily-2024-05-01",
+        "cursor": cursor,
+        "processed_topics": [TOPIC_A],
+        "failed_topics": [],
+        "completed": False
+    }
+    daily.scan_subscriptions_page.return_value = ([
+        {"email": "a@email.com", "zip_code": "11111", "sns_topic_arn": TOPIC_A},
+        {"email": "b@email.com", "zip_code": "22222", "sns_topic_arn": TOPIC_B}
+    ], None)
+
+    response = daily.lambda_function.lambda_handler(EVENT, {})
+
+    assert response["statusCode"] == 200
+
+    # The scan resumes from the saved cursor and only the unprocessed topic is alerted;
+    # the subscriber of the already alerted topic still gets their fire data saved
+    daily.scan_subscriptions_page.assert_called_once_with(cursor)
+    published = {call.kwargs["topic_arn"].split(":")[-1]: call.kwargs["publish"]
+                 for call in daily.process_fires.call_args_list}
+    assert published == {"topic-a": False, "topic-b": True}
+
+def test_daily_monitoring_lambda_handler_skips_completed_run(daily):
+    # A completed checkpoint means a retry of the same run has nothing left to do
+    daily.load_checkpoint.return_value = {
+        "run_id": "daily-2024-05-01", "cursor": None, "processed_topics": [], "failed_topics": [], "completed": True
+    }
+
+    response = daily.lambda_function.lambda_handler(EVENT, {})
+
+    assert response["statusCode"] == 200
+    assert "already completed" in json.loads(response["body"])["message"]
+    daily.scan_subscriptions_page.assert_not_called()
+
+def test_daily_monitoring_lambda_handler_uses_location_table(daily, tmp_path):
+    from lambda_functions.utils.location_table_utils import build_location_table, open_location_table
+
+    # A precomputed table with one topic near the fire and one far away
+    near_arn = "arn:aws:sns:us-east-1:123456789012:topic-near"
+    far_arn = "arn:aws:sns:us-east-1:123456789012:topic-far"
+    path = str(tmp_path / "locations.bin")
+    with open(path, "wb") as f:
+        f.write(build_location_table([
+            {"topic_arn": near_arn, "zip_code": "90001", "latitude": 34.0, "longitude": -118.2},
+            {"topic_arn": far_arn, "zip_code": "10001", "latitude": 40.7, "longitude": -74.0}
+        ]))
+    daily.load_location_table.return_value = open_location_table(path)
+
+    daily.scan_subscriptions_page.return_value = ([
+        {"email": "a@email.com", "zip_code": "90001", "sns_topic_arn": near_arn},
+        {"email": "b@email.com", "zip_code": "10001", "sns_topic_arn": far_arn}
+    ], None)
+
+    response = daily.lambda_function.lambda_handler(EVENT, {})
+
+    assert response["statusCode"] == 200
+
+    # Coordinates come from the table, and only the topic near the fire is processed
+    daily.get_coordinates.assert_not_called()
+    daily.process_fires.assert_called_once()
+    assert daily.process_fires.call_args.kwargs["topic_arn"] == near_arn
+    daily.upsert_subscriber_locations.assert_not_called()
+
+def test_daily_monitoring_lambda_handler_continues_when_out_of_time(daily):
+    daily.scan_subscriptions_page.return_value = ([
+        {"email": "a@email.com", "zip_code": "11111", "sns_topic_arn": TOPIC_A},
+        {"email": "b@email.com", "zip_code": "22222", "sns_topic_arn": TOPIC_B}
+    ], {"email": "b@email.com"})
+
+    # Less time remains than the checkpoint margin after the first subscription
+    context = MagicMock(function_name="DailyMonitoringFunction")
+    context.get_remaining_time_in_millis.return_value = 1000
+
+    response = daily.lambda_function.lambda_handler(EVENT, context)
+
+    assert response["statusCode"] == 202
+    daily.process_fires.assert_called_once()
+
+    # The run is checkpointed at the current page and re-invoked with the same event to finish today
+    daily.save_checkpoint.assert_called_once_with("fake-bucket", "daily-2024-05-01", None, {TOPIC_A}, set())
+    daily.continue_run.assert_called_once_with("DailyMonitoringFunction", EVENT)
+
+def test_daily_monitoring_lambda_handler_retries_failed_alerts(daily):
+    daily.process_fires.return_value = False
+    daily.scan_subscriptions_page.return_value = ([
+        {"email": "a@email.com", "zip_code": "11111", "sns_topic_arn": TOPIC_A}
+    ], None)
+
+    # A failed publish raises out of the handler so Lambda retries the run
+    with pytest.raises(daily.lambda_function.RunIncompleteError):
+        daily.lambda_function.lambda_handler(EVENT, {})
+
+    # The failed topic is not checkpointed as processed and the run is left open
+    daily.save_checkpoint.assert_called_once_with("fake-bucket", "daily-2024-05-01", None, set(), {TOPIC_A})
+
+def test_daily_monitoring_lambda_handler_keeps_failures_across_continuations(daily):
+    # A previous invocation failed to alert topic-a on the first page, then ran out of time on the second
+    cursor = {"email": "a@email.com"}
+    daily.load_checkpoint.return_value = {
+        "run_id": "daily-2024-05-01",
+        "cursor": cursor,
+        "processed_topics": [],
+        "failed_topics": [TOPIC_A],
+        "completed": False
+    }
+    daily.scan_subscriptions_page.return_value = ([
+        {"email": "b@email.com", "zip_code": "22222", "sns_topic_arn": TOPIC_B}
+    ], None)
+
+    # The continuation finishes the last page but does not mark the run completed
+    with pytest.raises(daily.lambda_function.RunIncompleteError):
+        daily.lambda_function.lambda_handler(EVENT, {})
+
+    # The retry rescans from the start so topic-a is alerted again
+    daily.save_checkpoint.assert_called_once_with("fake-bucket", "daily-2024-05-01", None, {TOPIC_B}, {TOPIC_A})
+
+def test_daily_monitoring_lambda_handler_skips_invalid_subscriptions(daily):
+    daily.scan_subscriptions_page.return_value = ([
+        {"email": "bad-email", "zip_code": "11111", "sns_topic_arn": TOPIC_A},
+        {"email": "b@email.com", "zip_code": "22222", "sns_topic_arn": TOPIC_B}
+    ], None)
+
+    response = daily.lambda_function.lambda_handler(EVENT, {})
+
+    # An invalid record is logged and skipped instead of failing every retry of the run
+    assert response["statusCode"] == 200
+    daily.process_fires.assert_called_once()
+    assert daily.process_fires.call_args.kwargs["topic_arn"] == TOPIC_B
+    daily.save_checkpoint.assert_called_once_with(
+        "fake-bucket", "daily-2024-05-01", None, {TOPIC_B}, completed=True
+    )
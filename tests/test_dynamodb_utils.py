@@ -59,6 +59,50 @@ class TestSaveSubscription:
         with pytest.raises(ValueError, match="Invalid SNS topic ARN"):
             save_subscription("test@email.com", "12345", "bad-topic-arn")
 
+    @patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table"})
+    @patch("lambda_functions.utils.dynamodb_utils.subscription_table")
+    def test_saves_custom_thresholds(self, mock_subscription_table):
+        from decimal import Decimal
+        from lambda_functions.utils.dynamodb_utils import save_subscription
+
+        save_subscription("test@email.com", "12345", "arn:aws:sns:us-east-1:123456789012:zip-12345",
+                          alert_radius_miles=25, frp_threshold=10.5)
+
+        # Thresholds are stored as DynamoDB numbers alongside the subscription
+        item = mock_subscription_table.put_item.call_args.kwargs["Item"]
+        assert item["alert_radius_miles"] == Decimal("25")
+        assert item["frp_threshold"] == Decimal("10.5")
+
+    @patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table"})
+    @patch("lambda_functions.utils.dynamodb_utils.subscription_table")
+    def test_raises_on_invalid_radius(self, mock_subscription_table):
+        # A radius outside the allowed range is rejected
+        from lambda_functions.utils.dynamodb_utils import save_subscription
+        with pytest.raises(ValueError, match="Invalid alert radius"):
+            save_subscription("test@email.com", "12345", "arn:aws:sns:us-east-1:123456789012:zip-12345",
+                              alert_radius_miles=5000)
+
+    @patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table"})
+    @patch("lambda_functions.utils.dynamodb_utils.subscription_table")
+    def test_raises_on_non_finite_or_huge_frp(self, mock_subscription_table):
+        # NaN and Infinity parse from JSON but are never valid thresholds
+        from lambda_functions.utils.dynamodb_utils import save_subscription
+        for frp_threshold in (float("nan"), float("inf"), 1e6):
+            with pytest.raises(ValueError, match="Invalid FRP threshold"):
+                save_subscription("test@email.com", "12345", "arn:aws:sns:us-east-1:123456789012:zip-12345",
+                                  frp_threshold=frp_threshold)
+        mock_subscription_table.put_item.assert_not_called()
+
+    @patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table"})
+    @patch("lambda_functions.utils.dynamodb_utils.subscription_table")
+    def test_stores_thresholds_at_canonical_precision(self, mock_subscription_table):
+        # Thresholds that differ below the stored precision are saved identically
+        from decimal import Decimal
+        from lambda_functions.utils.dynamodb_utils import save_subscription
+        save_subscription("test@email.com", "12345", "arn:aws:sns:us-east-1:123456789012:zip-12345",
+                          frp_threshold=10.0000001)
+        assert mock_subscription_table.put_item.call_args.kwargs["Item"]["frp_threshold"] == Decimal("10.0")
+
 
 # Test suite for the get_subscriptions function
 class TestGetSubscriptions:
@@ -91,3 +135,48 @@ class TestGetSubscriptions:
         # Ensure that an exception doesn't crash the app, but returns an empty list instead
         assert result == []
         mock_subscription_table.scan.assert_called_once()
+
+
+# Test suite for the scan_subscriptions_page function
+class TestScanSubscriptionsPage:
+    @patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table"})
+    @patch("lambda_functions.utils.dynamodb_utils.subscription_table")
+    def test_resumes_from_start_key(self, mock_subscription_table):
+        # Simulate a page that has more results after it
+        fake_items = [{"email": "a@email.com", "zip_code": "54321"}]
+        mock_subscription_table.scan.return_value = {
+            "Items": fake_items,
+            "LastEvaluatedKey": {"email": "a@email.com"}
+        }
+
+        from lambda_functions.utils.dynamodb_utils import scan_subscriptions_page
+        items, last_key = scan_subscriptions_page({"email": "start@email.com"}, page_size=10)
+
+        # Ensure the scan starts at the given key and returns the next cursor
+        assert items == fake_items
+        assert last_key == {"email": "a@email.com"}
+        mock_subscription_table.scan.assert_called_once_with(
+            ExclusiveStartKey={"email": "start@email.com"},
+            Limit=10
+        )
+
+
+# Test suite for the get_existing_subscriptions function
+class TestGetExistingSubscriptions:
+    @patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table"})
+    @patch("lambda_functions.utils.dynamodb_utils.dynamodb")
+    @patch("lambda_functions.utils.dynamodb_utils.subscription_table")
+    def test_reads_stored_items_by_table_key(self, mock_subscription_table, mock_dynamodb):
+        from lambda_functions.utils import dynamodb_utils
+
+        # A table keyed by email alone: a new zip code overwrites the previous item
+        mock_subscription_table.key_schema = [{"AttributeName": "email", "KeyType": "HASH"}]
+        stored = {"email": "a@email.com", "zip_code": "54321", "sns_topic_arn": "arn:aws:sns:us-east-1:123456789012:old"}
+        mock_dynamodb.batch_get_item.return_value = {"Responses": {dynamodb_utils.DYNAMODB_TABLE_NAME: [stored]}}
+
+        result = dynamodb_utils.get_existing_subscriptions([("a@email.com", "12345"), ("b@email.com", "12345")])
+
+        # Only the pair that would overwrite a stored item is returned, read in one batch
+        assert result == {("a@email.com", "12345"): stored}
+        keys = mock_dynamodb.batch_get_item.call_args.kwargs["RequestItems"][dynamodb_utils.DYNAMODB_TABLE_NAME]["Keys"]
+        assert sorted(key["email"] for key in keys) == ["a@email.com", "b@email.com"]
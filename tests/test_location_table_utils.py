@@ -0,0 +1,147 @@
+import sys
+import os
+from unittest.mock import patch, MagicMock
+import pandas as pd
+
+# Add root directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lambda_functions.utils.location_table_utils import (
+    build_location_table,
+    open_location_table,
+    match_topics,
+    record_pending_locations,
+    compact_pending_locations
+)
+
+ROWS = [
+    {"topic_arn": "arn:aws:sns:us-east-1:123456789012:topic-la", "zip_code": "90001", "latitude": 34.0, "longitude": -118.2},
+    {"topic_arn": "arn:aws:sns:us-east-1:123456789012:topic-ny", "zip_code": "10001", "latitude": 40.7, "longitude": -74.0},
+    {"topic_arn": "arn:aws:sns:us-east-1:123456789012:topic-sf", "zip_code": "94103", "latitude": 37.8, "longitude": -122.4}
+]
+
+def write_table(tmp_path, rows):
+    path = str(tmp_path / "locations.bin")
+    with open(path, "wb") as f:
+        f.write(build_location_table(rows))
+    return open_location_table(path)
+
+class TestLocationTable:
+    def test_round_trips_through_memory_map(self, tmp_path):
+        table = write_table(tmp_path, ROWS)
+
+        # Every topic keeps its zip code and float32 coordinates
+        assert len(table) == 3
+        lat, lon = table.coordinates_for("arn:aws:sns:us-east-1:123456789012:topic-ny")
+        assert abs(lat - 40.7) < 1e-4 and abs(lon + 74.0) < 1e-4
+        assert sorted(row["zip_code"] for row in table.to_rows()) == ["10001", "90001", "94103"]
+        assert table.coordinates_for("arn:aws:sns:us-east-1:123456789012:unknown") is None
+
+class TestMatchTopics:
+    def test_matches_only_topics_with_fires_in_radius(self, tmp_path):
+        table = write_table(tmp_path, ROWS)
+
+        # One strong fire near LA, one weak fire near NY
+        fires = pd.DataFrame({
+            "latitude": [34.5, 40.8],
+            "longitude": [-118.0, -74.1],
+            "frp": [80.0, 10.0]
+        })
+
+        assert match_topics(table, fires) == {"arn:aws:sns:us-east-1:123456789012:topic-la"}
+
+    def test_applies_each_topics_own_thresholds(self, tmp_path):
+        rows = [dict(row) for row in ROWS]
+        rows[0].update({"alert_radius_miles": 25, "frp_threshold": 50})  # LA only wants nearby fires
+        rows[1].update({"alert_radius_miles": 100, "frp_threshold": 5})  # NY wants weak fires too
+        table = write_table(tmp_path, rows)
+
+        assert table.thresholds_for("arn:aws:sns:us-east-1:123456789012:topic-la") == (25.0, 50.0)
+
+        fires = pd.DataFrame({
+            "latitude": [34.5, 40.8],
+            "longitude": [-118.0, -74.1],
+            "frp": [80.0, 10.0]
+        })
+
+        # The LA fire is ~36 miles away, outside its 25 mile radius; NY matches at its lower FRP
+        assert match_topics(table, fires) == {"arn:aws:sns:us-east-1:123456789012:topic-ny"}
+
+        # Explicit thresholds override every topic's own
+        assert match_topics(table, fires, 100, 50) == {"arn:aws:sns:us-east-1:123456789012:topic-la"}
+
+class TestPendingLocations:
+    @patch("lambda_functions.utils.location_table_utils.upsert_subscriber_locations")
+    @patch("lambda_functions.utils.location_table_utils.get_coordinates")
+    @patch("lambda_functions.utils.location_table_utils.s3")
+    def test_sign_ups_are_queued_then_compacted_in_one_upsert(self, mock_s3, mock_get_coordinates, mock_upsert):
+        # Signing up only writes one small object per topic, without touching the table
+        record_pending_locations("bucket", [
+            {"topic_arn": ROWS[0]["topic_arn"], "zip_code": "90001"},
+            {"topic_arn": ROWS[1]["topic_arn"], "zip_code": "10001", "frp_threshold": 10.0}
+        ])
+        written = {kwargs["Key"]: kwargs["Body"] for _, kwargs in mock_s3.put_object.call_args_list}
+        assert len(written) == 2
+        mock_upsert.assert_not_called()
+
+        # Compaction reads the queued objects back, geocodes each zip code once and merges them together
+        paginator = MagicMock()
+        paginator.paginate.return_value = [{"Contents": [{"Key": key} for key in written]}]
+        mock_s3.get_paginator.return_value = paginator
+        mock_s3.get_object.side_effect = lambda Bucket, Key: {"Body": MagicMock(read=lambda: written[Key])}
+        mock_get_coordinates.side_effect = lambda zip_code: {"90001": (34.0, -118.2), "10001": (40.7, -74.0)}[zip_code]
+
+        assert compact_pending_locations("bucket") == 2
+
+        merged = mock_upsert.call_args[0][1]
+        assert {row["zip_code"]: (row["latitude"], row.get("frp_threshold")) for row in merged} == {
+            "90001": (34.0, None),
+            "10001": (40.7, 10.0)
+        }
+        deleted = mock_s3.delete_objects.call_args.kwargs["Delete"]["Objects"]
+        assert sorted(item["Key"] for item in deleted) == sorted(written)
+
+    @patch("lambda_functions.utils.location_table_utils.COMPACT_BATCH_SIZE", 2)
+    @patch("lambda_functions.utils.location_table_utils.upsert_subscriber_locations")
+    @patch("lambda_functions.utils.location_table_utils.get_coordinates")
+    @patch("lambda_functions.utils.location_table_utils.s3")
+    def test_compaction_is_batched_and_keeps_failed_geocodes(self, mock_s3, mock_get_coordinates, mock_upsert):
+        import json
+
+        # Five queued topics, one of them in a zip code the geocoder cannot resolve right now
+        queued = {f"pending/{i}.json": json.dumps({"topic_arn": f"topic-{i}", "zip_code": zip_code})
+                  for i, zip_code in enumerate(["90001", "00000", "90001", "10001", "10001"])}
+        paginator = MagicMock()
+        paginator.paginate.return_value = [{"Contents": [{"Key": key} for key in queued]}]
+        mock_s3.get_paginator.return_value = paginator
+        mock_s3.get_object.side_effect = lambda Bucket, Key: {"Body": MagicMock(read=lambda: queued[Key])}
+        mock_get_coordinates.side_effect = lambda zip_code: {"90001": (34.0, -118.2), "10001": (40.7, -74.0)}.get(zip_code)
+
+        assert compact_pending_locations("bucket") == 4
+
+        # Rows are merged two at a time and only merged objects are removed from the queue
+        assert [len(call.args[1]) for call in mock_upsert.call_args_list] == [2, 2]
+        deleted = [item["Key"] for call in mock_s3.delete_objects.call_args_list
+                   for item in call.kwargs["Delete"]["Objects"]]
+        assert "pending/1.json" not in deleted
+        assert len(deleted) == 4
+
+    @patch("lambda_functions.utils.location_table_utils.upsert_subscriber_locations")
+    @patch("lambda_functions.utils.location_table_utils.get_coordinates", return_value=(34.0, -118.2))
+    @patch("lambda_functions.utils.location_table_utils.s3")
+    def test_compaction_stops_when_out_of_time(self, mock_s3, mock_get_coordinates, mock_upsert):
+        import json
+
+        paginator = MagicMock()
+        paginator.paginate.return_value = [{"Contents": [{"Key": f"pending/{i}.json"} for i in range(3)]}]
+        mock_s3.get_paginator.return_value = paginator
+        mock_s3.get_object.side_effect = lambda Bucket, Key: {
+            "Body": MagicMock(read=lambda: json.dumps({"topic_arn": Key, "zip_code": "90001"}))
+        }
+
+        # Time runs out after the first topic; it is still merged and the rest stay queued
+        remaining = iter([False, True])
+        assert compact_pending_locations("bucket", should_stop=lambda: next(remaining)) == 1
+        mock_upsert.assert_called_once()
+        deleted = mock_s3.delete_objects.call_args.kwargs["Delete"]["Objects"]
+        assert deleted == [{"Key": "pending/0.json"}]
@@ -0,0 +1,51 @@
+import sys
+import os
+import json
+from unittest.mock import patch, MagicMock
+
+# Add root directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+@patch.dict(os.environ, {"BUCKET_NAME": "fake-bucket", "DYNAMODB_TABLE_NAME": "fake-table"})
+@patch("lambda_functions.near_real_time_function.lambda_function.save_snapshot")
+@patch("lambda_functions.near_real_time_function.lambda_function.load_snapshot")
+@patch("lambda_functions.near_real_time_function.lambda_function.poll_once")
+@patch("lambda_functions.near_real_time_function.lambda_function.load_location_table")
+@patch("lambda_functions.near_real_time_function.lambda_function.compact_pending_locations", return_value=0)
+def test_near_real_time_lambda_handler_success(
+    mock_compact_locations,
+    mock_load_location_table,
+    mock_poll_once,
+    mock_load_snapshot,
+    mock_save_snapshot
+):
+    from lambda_functions.near_real_time_function import lambda_function
+
+    # Mock the subscriber table, the previous snapshot and a poll that alerts one topic
+    table = MagicMock()
+    mock_load_location_table.return_value = table
+    previous = {"keys": {"34.05|-118.25"}, "pending": {}}
+    current = {"keys": {"34.05|-118.25", "34.1|-118.3"}, "pending": {}}
+    mock_load_snapshot.return_value = previous
+    mock_poll_once.return_value = (current, 1)
+
+    # Simulate an EventBridge scheduled event trigger
+    event = {
+        "source": "aws.events",
+        "detail-type": "Scheduled Event"
+    }
+
+    # Invoke the Lambda function
+    response = lambda_function.lambda_handler(event, {})
+
+    # Check that the response is successful and reports the alerted topics
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["alerted_topics"] == 1
+
+    # Subscribers are matched through the location table, and the new snapshot is persisted
+    mock_poll_once.assert_called_once_with(previous, table)
+    mock_save_snapshot.assert_called_once_with("fake-bucket", current)
+
+    # Queued sign-ups are compacted after the poll, with the time left in the invocation
+    mock_compact_locations.assert_called_once()
+    assert mock_compact_locations.call_args.args == ("fake-bucket",)
@@ -0,0 +1,86 @@
+import sys
+import os
+import json
+from unittest.mock import patch
+
+# Add root directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+@patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table-name"})
+@patch("lambda_functions.onboarding_worker_function.lambda_function.unsubscribe_users_from_topics", return_value=[])
+@patch("lambda_functions.onboarding_worker_function.lambda_function.get_existing_subscriptions")
+@patch("lambda_functions.onboarding_worker_function.lambda_function.subscribe_users_to_topics")
+@patch("lambda_functions.onboarding_worker_function.lambda_function.save_subscriptions")
+@patch("lambda_functions.onboarding_worker_function.lambda_function.get_or_create_sns_topics")
+def test_onboarding_worker_processes_batch(mock_get_topics, mock_save_subs, mock_subscribe, mock_get_existing,
+                                           mock_unsubscribe):
+    from lambda_functions.onboarding_worker_function.lambda_function import lambda_handler
+
+    topic_a = "arn:aws:sns:us-east-1:123456789012:wildfire-alerts-12345"
+    topic_b = "arn:aws:sns:us-east-1:123456789012:wildfire-alerts-54321"
+    topic_custom = "arn:aws:sns:us-east-1:123456789012:wildfire-alerts-12345-r25-f10"
+    mock_get_topics.return_value = {
+        ("12345", None, None): topic_a,
+        ("54321", None, None): topic_b,
+        ("12345", 25, 10): topic_custom
+    }
+
+    # d@email.com already subscribed to the default topic and now picks custom thresholds;
+    # a@email.com signs up again unchanged
+    mock_get_existing.return_value = {
+        ("a@email.com", "12345"): {"email": "a@email.com", "zip_code": "12345", "sns_topic_arn": topic_a},
+        ("d@email.com", "12345"): {"email": "d@email.com", "zip_code": "12345", "sns_topic_arn": topic_a}
+    }
+
+    # Simulate one subscribe failing so its message goes back to the queue
+    mock_subscribe.return_value = [("c@email.com", topic_b)]
+
+    # Simulate an SQS batch with two sign-ups for the same zip, one for another and one malformed
+    event = {"Records": [
+        {"messageId": "1", "body": json.dumps({"email": "a@email.com", "zip_code": "12345"})},
+        {"messageId": "2", "body": json.dumps({"email": "b@email.com", "zip_code": "12345"})},
+        {"messageId": "3", "body": json.dumps({"email": "c@email.com", "zip_code": "54321"})},
+        {"messageId": "4", "body": json.dumps({"email": "not-an-email", "zip_code": "12345"})},
+        {"messageId": "5", "body": json.dumps({
+            "email": "d@email.com", "zip_code": "12345", "alert_radius_miles": 25, "frp_threshold": 10
+        })}
+    ]}
+
+    response = lambda_handler(event, None)
+
+    # Topics are resolved once for the batch's zip code and threshold pairs
+    mock_get_topics.assert_called_once()
+    assert set(mock_get_topics.call_args[0][0]) == {("12345", None, None), ("54321", None, None), ("12345", 25, 10)}
+
+    # Only the subscriber whose topic changed leaves the previous one
+    mock_unsubscribe.assert_called_once_with([("d@email.com", topic_a)])
+
+    # All valid subscriptions are saved in one batch write and subscribed together
+    saved = mock_save_subs.call_args[0][0]
+    assert sorted(saved) == [
+        ("a@email.com", "12345", topic_a, None, None),
+        ("b@email.com", "12345", topic_a, None, None),
+        ("c@email.com", "54321", topic_b, None, None),
+        ("d@email.com", "12345", topic_custom, 25, 10)
+    ]
+    mock_subscribe.assert_called_once()
+
+    # Only the failed subscribe is reported back; the malformed message is dropped
+    assert response == {"batchItemFailures": [{"itemIdentifier": "3"}]}
+
+@patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table-name"})
+@patch("lambda_functions.onboarding_worker_function.lambda_function.lambda_handler")
+def test_local_runner_drains_queue_into_worker(mock_worker_handler):
+    from lambda_functions.utils.queue_utils import local_queue, enqueue_onboarding_request
+    from lambda_functions.onboarding_worker_function.local_runner import drain_local_queue
+
+    local_queue.drain(len(local_queue))
+    message_ids = [enqueue_onboarding_request(f"user{i}@email.com", "12345", local=True) for i in range(3)]
+    mock_worker_handler.return_value = {"batchItemFailures": [{"itemIdentifier": message_ids[0]}]}
+
+    # Queued requests reach the worker in SQS-sized batches until the local queue is empty
+    failed = drain_local_queue(batch_size=2)
+
+    assert [len(call.args[0]["Records"]) for call in mock_worker_handler.call_args_list] == [2, 1]
+    assert failed == [message_ids[0], message_ids[0]]
+    assert len(local_queue) == 0
@@ -0,0 +1,62 @@
+import sys
+import os
+import json
+from unittest.mock import patch
+
+# Add root directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lambda_functions.utils.replay_utils import load_archive, load_subscribers, run_replay
+
+LA_TOPIC = "arn:aws:sns:us-east-1:123456789012:wildfire-alerts-90001"
+NY_TOPIC = "arn:aws:sns:us-east-1:123456789012:wildfire-alerts-10001"
+
+def write_archive(tmp_path):
+    # Three days of detections near LA, one of them below the default FRP threshold
+    (tmp_path / "firms_2023_07.csv").write_text(
+        "latitude,longitude,frp,acq_date,acq_time\n"
+        "34.10,-118.30,80.0,2023-07-01,1200\n"
+        "34.12,-118.31,60.0,2023-07-01,1300\n"
+        "34.20,-118.40,30.0,2023-07-02,1200\n"
+        "34.30,-118.50,90.0,2023-07-03,1200\n"
+        "34.30,-118.50,90.0,2023-08-01,1200\n"
+    )
+    subscribers = tmp_path / "subscribers.json"
+    subscribers.write_text(json.dumps([
+        {"sns_topic_arn": LA_TOPIC, "zip_code": "90001", "latitude": 34.05, "longitude": -118.25},
+        {"sns_topic_arn": NY_TOPIC, "zip_code": "10001", "latitude": 40.7, "longitude": -74.0}
+    ]))
+    return str(tmp_path), str(subscribers)
+
+class TestRunReplay:
+    @patch("lambda_functions.utils.wildfire_utils.s3")
+    @patch("lambda_functions.utils.sns_utils.get_sns_client")
+    def test_counts_alerts_per_topic_without_side_effects(self, mock_sns_client, mock_s3, tmp_path):
+        archive, subscribers = write_archive(tmp_path)
+
+        data = load_archive(archive, "2023-07-01", "2023-07-31")
+        report = run_replay(data, load_subscribers(subscribers), processes=1)
+
+        # The August detection is outside the date range
+        assert report["days"] == 3
+        assert report["detections"] == 4
+
+        # LA is alerted on the two days with a fire over the default threshold, NY never
+        assert list(report["topics"]) == [LA_TOPIC]
+        assert report["topics"][LA_TOPIC]["alert_days"] == 2
+        assert report["topics"][LA_TOPIC]["fires"] == 3
+        assert report["detections_per_second"] > 0
+
+        # Nothing is published or uploaded during a replay
+        mock_sns_client.assert_not_called()
+        mock_s3.put_object.assert_not_called()
+
+    def test_lower_threshold_across_processes(self, tmp_path):
+        archive, subscribers = write_archive(tmp_path)
+
+        data = load_archive(archive, "2023-07-01", "2023-07-31")
+        report = run_replay(data, load_subscribers(subscribers), frp_threshold=25, processes=2)
+
+        # Lowering the FRP threshold adds an alert on the second day
+        assert report["topics"][LA_TOPIC]["alert_days"] == 3
+        assert report["alerts"] == 3
@@ -9,6 +9,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 from lambda_functions.utils.sns_utils import (
     get_or_create_sns_topic,
+    get_or_create_sns_topics,
+    get_topic_name,
+    subscribe_users_to_topics,
     subscribe_user_to_topic,
     send_clustered_alert
 )
@@ -76,6 +79,73 @@ class TestGetOrCreateSNSTopic:
         assert result == new_arn
         mock_sns.create_topic.assert_called_once_with(Name=f"wildfire-alerts-{zip_code}")
 
+class TestGetOrCreateSNSTopics:
+    @patch("boto3.client")
+    def test_lists_once_and_creates_missing_topics(self, mock_boto_client):
+        existing_arn = "arn:aws:sns:us-east-1:123456789012:wildfire-alerts-12345"
+        new_arn = "arn:aws:sns:us-east-1:123456789012:wildfire-alerts-54321"
+
+        # Mock the paginator to return only the first zip code's topic
+        mock_sns = MagicMock()
+        mock_boto_client.return_value = mock_sns
+        mock_paginator = MagicMock()
+        mock_paginator.paginate.return_value = [{"Topics": [{"TopicArn": existing_arn}]}]
+        mock_sns.get_paginator.return_value = mock_paginator
+        mock_sns.create_topic.return_value = {"TopicArn": new_arn}
+
+        result = get_or_create_sns_topics([("12345", None, None), ("54321", None, None), ("12345", None, None)])
+
+        # Each zip code resolves to its topic and only the missing one is created
+        assert result == {("12345", None, None): existing_arn, ("54321", None, None): new_arn}
+        mock_paginator.paginate.assert_called_once()
+        mock_sns.create_topic.assert_called_once_with(Name="wildfire-alerts-54321")
+
+    @patch("boto3.client")
+    def test_custom_thresholds_get_their_own_topic(self, mock_boto_client):
+        default_arn = "arn:aws:sns:us-east-1:123456789012:wildfire-alerts-12345"
+        custom_arn = "arn:aws:sns:us-east-1:123456789012:wildfire-alerts-12345-r25-f10_5"
+
+        # Only the default topic exists so far
+        mock_sns = MagicMock()
+        mock_boto_client.return_value = mock_sns
+        mock_paginator = MagicMock()
+        mock_paginator.paginate.return_value = [{"Topics": [{"TopicArn": default_arn}]}]
+        mock_sns.get_paginator.return_value = mock_paginator
+        mock_sns.create_topic.return_value = {"TopicArn": custom_arn}
+
+        result = get_or_create_sns_topics([("12345", 25, 10.5)])
+
+        # The subscriber with custom thresholds is not put on the default topic
+        assert result == {("12345", 25, 10.5): custom_arn}
+        mock_sns.create_topic.assert_called_once_with(Name="wildfire-alerts-12345-r25-f10_5")
+
+    def test_topic_names_use_exact_fixed_point_thresholds(self):
+        # No exponent, which SNS rejects, and no precision lost between distinct thresholds
+        assert get_topic_name("12345", None, 1e6) == "wildfire-alerts-12345-f1000000"
+        assert get_topic_name("12345", 100.0, 10.0) == "wildfire-alerts-12345-r100-f10"
+        assert get_topic_name("12345", None, 10.0000001) != get_topic_name("12345", None, 10)
+
+class TestSubscribeUsersToTopics:
+    @patch("boto3.client")
+    def test_returns_failed_subscriptions(self, mock_boto_client):
+        # Fail the subscribe call for one of the two users
+        mock_sns = MagicMock()
+        mock_boto_client.return_value = mock_sns
+        def fake_subscribe(**kwargs):
+            if kwargs["Endpoint"] == "b@email.com":
+                raise Exception("throttled")
+            return {"SubscriptionArn": "fake-arn"}
+        mock_sns.subscribe.side_effect = fake_subscribe
+
+        topic_arn = "arn:aws:sns:us-east-1:123456789012:test-topic"
+        failed = subscribe_users_to_topics([("a@email.com", topic_arn), ("b@email.com", topic_arn)])
+
+        assert failed == [("b@email.com", topic_arn)]
+        assert mock_sns.subscribe.call_count == 2
+
+        # One client is created up front and shared by the worker threads
+        mock_boto_client.assert_called_once_with("sns")
+
 class TestSendClusteredAlert:
     @patch("boto3.client")
     def test_publish_called_with_clusters(self, mock_boto_client):
@@ -0,0 +1,100 @@
+import sys
+import os
+from unittest.mock import MagicMock
+import pandas as pd
+
+# Add root directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lambda_functions.utils.streaming_utils import diff_new_detections, detection_keys, poll_once
+from lambda_functions.utils.location_table_utils import build_location_table, parse_location_table
+
+TOPIC_ARN = "arn:aws:sns:us-east-1:123456789012:test-topic"
+TABLE = parse_location_table(build_location_table([
+    {"topic_arn": TOPIC_ARN, "zip_code": "12345", "latitude": 34.05, "longitude": -118.25}
+]))
+
+def snapshot_of(fires):
+    return {"keys": set(detection_keys(fires)), "pending": {}}
+
+def make_fires(rows):
+    return pd.DataFrame(rows, columns=["latitude", "longitude", "frp", "acq_date", "acq_time"])
+
+class TestDiffNewDetections:
+    def test_returns_only_unseen_detections(self):
+        previous = make_fires([[34.05, -118.25, 60.0, "2024-05-01", 1200]])
+        current = make_fires([
+            [34.05, -118.25, 60.0, "2024-05-01", 1200],
+            [34.10, -118.30, 80.0, "2024-05-01", 1300]
+        ])
+
+        new_fires, keys = diff_new_detections(current, set(detection_keys(previous)))
+
+        # Only the detection from the later pass should be treated as new
+        assert len(new_fires) == 1
+        assert new_fires.iloc[0]["acq_time"] == 1300
+        assert len(keys) == 2
+
+class TestPollOnce:
+    def test_first_poll_only_seeds_snapshot(self):
+        fetch = MagicMock(return_value=make_fires([[34.05, -118.25, 60.0, "2024-05-01", 1200]]))
+        send_alert = MagicMock()
+
+        snapshot, alerted = poll_once(None, TABLE, fetch=fetch, send_alert=send_alert)
+
+        # Without a previous snapshot nothing is alerted, the detections are just recorded
+        assert alerted == 0
+        assert len(snapshot["keys"]) == 1
+        send_alert.assert_not_called()
+
+    def test_alerts_subscribers_near_new_fires(self):
+        previous = make_fires([[34.05, -118.25, 60.0, "2024-05-01", 1200]])
+        current = make_fires([
+            [34.05, -118.25, 60.0, "2024-05-01", 1200],
+            [34.10, -118.30, 80.0, "2024-05-01", 1300],
+            [45.00, -100.00, 90.0, "2024-05-01", 1300]
+        ])
+        send_alert = MagicMock()
+
+        snapshot, alerted = poll_once(
+            snapshot_of(previous),
+            TABLE,
+            fetch=MagicMock(return_value=current),
+            send_alert=send_alert
+        )
+
+        # Only the new fire inside the radius is sent to the subscriber's topic
+        assert alerted == 1
+        send_alert.assert_called_once()
+        fires, email, topic_arn = send_alert.call_args[0]
+        assert len(fires) == 1
+        assert topic_arn == TOPIC_ARN
+
+        # The message is rendered with distances from the topic's location, as in the daily alert
+        assert "Distance:" in send_alert.call_args.kwargs["message"]
+        assert snapshot["pending"] == {}
+
+    def test_failed_alert_is_retried_next_poll(self):
+        previous = make_fires([[34.05, -118.25, 60.0, "2024-05-01", 1200]])
+        current = make_fires([
+            [34.05, -118.25, 60.0, "2024-05-01", 1200],
+            [34.10, -118.30, 80.0, "2024-05-01", 1300]
+        ])
+        send_alert = MagicMock(side_effect=Exception("SNS unavailable"))
+
+        snapshot, alerted = poll_once(
+            snapshot_of(previous), TABLE, fetch=MagicMock(return_value=current), send_alert=send_alert
+        )
+
+        # The detection is seen, but kept pending for the topic whose alert failed
+        assert alerted == 0
+        assert len(snapshot["keys"]) == 2
+        assert list(snapshot["pending"]) == [TOPIC_ARN]
+
+        # The next poll has no new detections, yet sends the failed topic its fire again
+        send_alert = MagicMock()
+        snapshot, alerted = poll_once(snapshot, TABLE, fetch=MagicMock(return_value=current), send_alert=send_alert)
+
+        assert alerted == 1
+        assert len(send_alert.call_args[0][0]) == 1
+        assert snapshot["pending"] == {}
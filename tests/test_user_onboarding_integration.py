@@ -7,10 +7,11 @@ from unittest.mock import patch
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 @patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table-name"})
+@patch("lambda_functions.user_onboarding_function.lambda_function.get_subscription", return_value=None)
 @patch("lambda_functions.user_onboarding_function.lambda_function.subscribe_user_to_topic")
 @patch("lambda_functions.user_onboarding_function.lambda_function.save_subscription")
 @patch("lambda_functions.user_onboarding_function.lambda_function.get_or_create_sns_topic")
-def test_user_onboarding_lambda_handler_success(mock_get_topic, mock_save_sub, mock_subscribe):
+def test_user_onboarding_lambda_handler_success(mock_get_topic, mock_save_sub, mock_subscribe, mock_get_subscription):
     from lambda_functions.user_onboarding_function.lambda_function import lambda_handler
 
     # Simulate a valid SNS topic ARN being returned for the zip code
@@ -33,6 +34,81 @@ def test_user_onboarding_lambda_handler_success(mock_get_topic, mock_save_sub, m
     assert body["zip_code"] == "12345"
 
     # Verify that internal helper functions were each called once
-    mock_get_topic.assert_called_once_with("12345")
+    mock_get_topic.assert_called_once_with("12345", None, None)
     mock_save_sub.assert_called_once()
     mock_subscribe.assert_called_once()
+
+@patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table-name"})
+@patch("lambda_functions.user_onboarding_function.lambda_function.unsubscribe_user_from_topic")
+@patch("lambda_functions.user_onboarding_function.lambda_function.get_subscription")
+@patch("lambda_functions.user_onboarding_function.lambda_function.subscribe_user_to_topic")
+@patch("lambda_functions.user_onboarding_function.lambda_function.save_subscription")
+@patch("lambda_functions.user_onboarding_function.lambda_function.get_or_create_sns_topic")
+def test_user_onboarding_lambda_handler_moves_subscriber_with_new_thresholds(
+    mock_get_topic, mock_save_sub, mock_subscribe, mock_get_subscription, mock_unsubscribe
+):
+    from lambda_functions.user_onboarding_function.lambda_function import lambda_handler
+
+    default_arn = "arn:aws:sns:us-east-1:123456789012:wildfire-alerts-12345"
+    custom_arn = "arn:aws:sns:us-east-1:123456789012:wildfire-alerts-12345-r25-f10"
+    mock_get_topic.return_value = custom_arn
+
+    # The user already subscribed to the zip code with the default thresholds
+    mock_get_subscription.return_value = {"email": "test@email.com", "zip_code": "12345", "sns_topic_arn": default_arn}
+
+    response = lambda_handler({"body": json.dumps({
+        "email": "test@email.com", "zip_code": "12345", "alert_radius_miles": 25, "frp_threshold": 10
+    })}, {})
+
+    # They leave the default topic, so only alerts at their new thresholds reach them
+    assert response["statusCode"] == 200
+    mock_unsubscribe.assert_called_once_with("test@email.com", default_arn)
+    mock_save_sub.assert_called_once_with("test@email.com", "12345", custom_arn, 25.0, 10.0)
+    mock_subscribe.assert_called_once_with("test@email.com", custom_arn)
+
+@patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table-name"})
+@patch("lambda_functions.user_onboarding_function.lambda_function.ONBOARDING_MODE", "local")
+@patch("lambda_functions.user_onboarding_function.lambda_function.get_or_create_sns_topic")
+def test_user_onboarding_lambda_handler_async_queues_request(mock_get_topic):
+    from lambda_functions.user_onboarding_function.lambda_function import lambda_handler
+    from lambda_functions.utils.queue_utils import local_queue
+
+    local_queue.drain(len(local_queue))
+
+    # In local mode the request goes to the local queue stand-in
+    response = lambda_handler({"body": '{"email": "test@email.com", "zip_code": "12345"}'}, {})
+
+    # The handler responds immediately without touching SNS
+    assert response["statusCode"] == 202
+    mock_get_topic.assert_not_called()
+
+    records = local_queue.drain()
+    assert len(records) == 1
+    assert json.loads(records[0]["body"]) == {"email": "test@email.com", "zip_code": "12345"}
+
+@patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table-name"})
+@patch("lambda_functions.user_onboarding_function.lambda_function.ONBOARDING_MODE", "async")
+@patch("lambda_functions.utils.queue_utils.ONBOARDING_QUEUE_URL", None)
+def test_user_onboarding_lambda_handler_async_fails_without_queue_url():
+    from lambda_functions.user_onboarding_function.lambda_function import lambda_handler
+    from lambda_functions.utils.queue_utils import local_queue
+
+    local_queue.drain(len(local_queue))
+
+    # Async mode without a queue URL is an error, not a silent in-process queue
+    response = lambda_handler({"body": '{"email": "test@email.com", "zip_code": "12345"}'}, {})
+
+    assert response["statusCode"] == 500
+    assert len(local_queue) == 0
+
+@patch.dict(os.environ, {"DYNAMODB_TABLE_NAME": "fake-table-name"})
+@patch("lambda_functions.user_onboarding_function.lambda_function.ONBOARDING_MODE", "async")
+@patch("lambda_functions.user_onboarding_function.lambda_function.enqueue_onboarding_request")
+def test_user_onboarding_lambda_handler_async_rejects_invalid_zip(mock_enqueue):
+    from lambda_functions.user_onboarding_function.lambda_function import lambda_handler
+
+    # Validation still happens inside the request, so bad input is rejected up front
+    response = lambda_handler({"body": '{"email": "test@email.com", "zip_code": "abc"}'}, {})
+
+    assert response["statusCode"] == 400
+    mock_enqueue.assert_not_called()
@@ -57,3 +57,48 @@ class TestProcessFires:
         alert_args, _ = mock_send_alert.call_args
         assert isinstance(alert_args[0], pd.DataFrame)
         assert len(alert_args[0]) == 1  # Only the high FRP fire should be included
+
+    @patch(f"{MODULE_PATH}.send_clustered_alert")
+    @patch(f"{MODULE_PATH}.build_clustered_alert")
+    @patch(f"{MODULE_PATH}.s3")
+    @patch(f"{MODULE_PATH}.fetch_fire_data")
+    def test_process_fires_reuses_cached_match(self, mock_fetch, mock_s3, mock_build_alert, mock_send_alert):
+        from lambda_functions.utils.wildfire_utils import match_cache, get_snapshot_version
+        match_cache.clear()
+        mock_build_alert.return_value = "rendered alert"
+
+        # A shared snapshot passed in by the caller, as the daily run does
+        data = pd.DataFrame({
+            "latitude": [34.05], "longitude": [-118.25], "frp": [60.0], "acq_date": ["2024-05-01"]
+        })
+        version = get_snapshot_version(data)
+        topic_arn = "arn:aws:sns:us-east-1:123456789012:test-topic"
+
+        # Two subscribers whose coordinates round to the same location
+        process_fires(34.051, -118.249, "a@email.com", "12345", topic_arn, "bucket", data=data, snapshot_version=version)
+        process_fires(34.049, -118.251, "b@email.com", "12345", topic_arn, "bucket", data=data, snapshot_version=version)
+
+        # The snapshot is never refetched and the alert is rendered only once
+        mock_fetch.assert_not_called()
+        mock_build_alert.assert_called_once()
+        assert mock_send_alert.call_count == 2
+        assert mock_send_alert.call_args.kwargs["message"] == "rendered alert"
+
+    @patch(f"{MODULE_PATH}.send_clustered_alert")
+    @patch(f"{MODULE_PATH}.s3")
+    def test_process_fires_reports_failed_send(self, mock_s3, mock_send_alert):
+        data = pd.DataFrame({
+            "latitude": [34.05], "longitude": [-118.25], "frp": [60.0], "acq_date": ["2024-05-01"]
+        })
+        topic_arn = "arn:aws:sns:us-east-1:123456789012:test-topic"
+
+        # A failed publish is reported so the caller can retry the topic
+        mock_send_alert.side_effect = Exception("SNS unavailable")
+        assert process_fires(34.05, -118.25, "a@email.com", "12345", topic_arn, "bucket", data=data) is False
+
+        # Without publishing, only the subscriber's fire data is saved
+        mock_send_alert.reset_mock()
+        mock_s3.reset_mock()
+        assert process_fires(34.05, -118.25, "b@email.com", "12345", topic_arn, "bucket", data=data, publish=False) is True
+        mock_send_alert.assert_not_called()
+        assert mock_s3.put_object.call_args.kwargs["Key"].startswith("b@email.com/12345/")